@@ -0,0 +1,84 @@
+"""
+Per-rerun cost of the auth gate at the top of every page.
+
+Runs a one-line page through Streamlit's AppTest for an already logged-in
+session and times just the auth call on each rerun: the previous
+behaviour (parse config.yaml and build a new Authenticate every rerun)
+against utils.auth_manager.require_auth. Uses a synthetic config.yaml
+in a scratch directory.
+
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --reruns 100 --users 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+from benchmarks import synthetic
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    # What require_auth did on every rerun before the config/authenticator were cached
+    "rebuild every rerun": """
+import time, yaml, streamlit as st, streamlit_authenticator as stauth
+start = time.perf_counter()
+with open('config.yaml') as file:
+    config = yaml.load(file, Loader=yaml.SafeLoader)
+authenticator = stauth.Authenticate(config['credentials'], config['cookie']['name'],
+                                    config['cookie']['key'], config['cookie']['expiry_days'])
+authenticator.login()
+with st.sidebar:
+    st.write(f'Welcome *{st.session_state["name"]}*')
+    authenticator.logout('Logout', 'main')
+st.session_state.timings.append(time.perf_counter() - start)
+""",
+    "require_auth": """
+import time, streamlit as st
+from utils.auth_manager import require_auth
+start = time.perf_counter()
+require_auth()
+st.session_state.timings.append(time.perf_counter() - start)
+""",
+}
+
+def time_page(source, reruns):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_string(source, default_timeout=30)
+    # An already logged-in session, as on every interaction after login
+    at.session_state["authentication_status"] = True
+    at.session_state["name"] = "Synthetic User 0"
+    at.session_state["username"] = "user0"
+    at.session_state["logout"] = None
+    at.session_state["timings"] = []
+    for _ in range(reruns + 1):
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return at.session_state["timings"][1:]  # first run builds the session's authenticator
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-rerun auth overhead.")
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20, help="users in the synthetic config.yaml")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "config.yaml"), "w") as f:
+            f.write(synthetic.auth_config(users=args.users))
+        os.chdir(tmp)
+        try:
+            sys.path.insert(0, REPO_ROOT)
+            for name, source in PAGES.items():
+                timings = time_page(source, args.reruns)
+                print(f"{name:>20}: {statistics.median(timings) * 1000:.3f} ms median per rerun "
+                      f"(p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1000:.3f} ms, {len(timings)} reruns)")
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start import profile for Home.py and every page.
+
+Runs each script's top-level imports in a fresh interpreter with
+`python -X importtime` and reports the slowest modules, so regressions in
+container restart time show up before deployment.
+
+    python -m benchmarks.bench_startup            # table, top 10 per script
+    python -m benchmarks.bench_startup --top 25 --json startup.json
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def app_scripts():
+    return ["Home.py"] + sorted(os.path.relpath(p, REPO_ROOT) for p in glob.glob(os.path.join(REPO_ROOT, "pages", "*.py")))
+
+def top_level_imports(script_path):
+    """Source of the import statements at module level (the cold-start cost)."""
+    with open(script_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+def parse_importtime(stderr):
+    """Parses -X importtime output into {module: (self_us, cumulative_us, depth)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+def profile_script(script):
+    code = top_level_imports(os.path.join(REPO_ROOT, script))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    modules = parse_importtime(proc.stderr)
+    # Top-level entries (depth 0 in the import tree) add up to the total import time
+    roots = {name: cum for name, (_, cum, depth) in modules.items() if depth == 0}
+    return {
+        "script": script,
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "wall_seconds": round(wall, 3),
+        "import_seconds": round(sum(roots.values()) / 1e6, 3),
+        "modules_loaded": len(modules),
+        "slowest": sorted(
+            ({"module": name, "cumulative_ms": round(cum / 1e3, 1), "self_ms": round(self_us / 1e3, 1)}
+             for name, (self_us, cum, _) in modules.items()),
+            key=lambda m: m["cumulative_ms"], reverse=True
+        ),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the Streamlit app scripts.")
+    parser.add_argument("--top", type=int, default=10, help="modules to list per script")
+    parser.add_argument("--json", help="also write the full profile to this file")
+    args = parser.parse_args()
+
+    results = [profile_script(s) for s in app_scripts()]
+    for r in results:
+        status = "" if r["ok"] else f"  (FAILED: {r['error']})"
+        print(f"\n{r['script']}: {r['import_seconds']:.3f}s imports, {r['wall_seconds']:.3f}s wall, "
+              f"{r['modules_loaded']} modules{status}")
+        for m in r["slowest"][:args.top]:
+            print(f"  {m['cumulative_ms']:>9.1f} ms  {m['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
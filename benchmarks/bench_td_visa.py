@@ -0,0 +1,84 @@
+"""
+Compares the pdfplumber word-coordinate TD VISA extractor with the old
+camelot stream path (page 3 only) for speed and row-for-row equality.
+
+    python -m benchmarks.bench_td_visa --pages 6 --txns 30
+
+camelot is only needed here: pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import td_visa_statement
+from utils.bank_parsers import extract_visa_activity_rows
+from utils.statement_document import StatementDocument
+
+def camelot_visa_rows(document, pages='3'):
+    """The previous camelot extraction, returning the same row tuples."""
+    import camelot
+
+    tables = camelot.read_pdf(document.stream(), pages=pages, flavor='stream')
+    if not tables:
+        return []
+    df = tables[0].df.replace(r'^\s*$', float('nan'), regex=True)
+    header_row = -1
+    for i, row in df.iterrows():
+        row_text = ' '.join(str(s) for s in row if pd.notna(s))
+        if 'Activity Date' in row_text and 'Reference Number' in row_text:
+            header_row = i
+            break
+    if header_row == -1:
+        return []
+    rows = []
+    for i in range(header_row + 1, len(df)):
+        row = df.iloc[i]
+        if pd.notna(row[1]) and pd.notna(row.iloc[-1]):
+            ref = row[2] if pd.notna(row[2]) else ''
+            desc = ' '.join(str(s) for s in row[3:-1] if pd.notna(s))
+            rows.append((row[1].strip(), ref, desc, row.iloc[-1]))
+    return rows
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def run(pages=6, txns=30, seed=0):
+    data = td_visa_statement(pages=pages, txns_per_page=txns, seed=seed)
+
+    plumber_rows, plumber_s = _timed(lambda: extract_visa_activity_rows(StatementDocument("visa.pdf", data)))
+    page3_rows = extract_visa_activity_rows(_PageSubset(StatementDocument("visa.pdf", data), [2]))
+    camelot_rows, camelot_s = _timed(lambda: camelot_visa_rows(StatementDocument("visa.pdf", data)))
+
+    return {
+        "pages": pages,
+        "pdfplumber_rows": len(plumber_rows),
+        "pdfplumber_seconds": round(plumber_s, 4),
+        "camelot_rows_page3": len(camelot_rows),
+        "camelot_seconds": round(camelot_s, 4),
+        "page3_rows_equal": page3_rows == camelot_rows,
+    }
+
+class _PageSubset:
+    """Restricts a StatementDocument to some pages, to compare with camelot's page 3."""
+
+    def __init__(self, document, indexes):
+        self.document, self.indexes = document, indexes
+        self.page_count = len(indexes)
+
+    def page_words(self, index, **kwargs):
+        return self.document.page_words(self.indexes[index], **kwargs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=6)
+    parser.add_argument("--txns", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for key, value in run(args.pages, args.txns, args.seed).items():
+        print(f"{key:>20}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Output check for the streaming Bank of America parser.
+
+Parses synthetic statements (multi-page withdrawals, multi-line
+descriptions, waived and wrapped service fees) with
+iter_bank_of_america_transactions and with the original algorithm (all
+page text joined, sections cut out with DOTALL regexes), normalizes both
+and exits non-zero if they differ.
+
+    python -m benchmarks.check_boa_parser
+    python -m benchmarks.check_boa_parser --statements 20 --pages 5
+"""
+import argparse
+import re
+import sys
+
+from benchmarks import synthetic
+
+def reference_rows(document):
+    """Raw rows as the parser built them before it streamed pages."""
+    from utils.bank_parsers import BOA_FEE_ENTRY, BOA_WITHDRAWAL_LINE, _boa_row
+
+    full_text = "\n".join(text for text in (document.page_text(i) for i in range(document.page_count)) if text)
+    rows = []
+    block = re.search(r'Withdrawals and other debits\n(.*?)\nTotal withdrawals and other debits', full_text, re.DOTALL)
+    if block:
+        current = None
+        for line in block.group(1).strip().split('\n'):
+            match = BOA_WITHDRAWAL_LINE.match(line)
+            if match:
+                if current:
+                    rows.append(_boa_row(current[0], ' '.join(current[1]), current[2]))
+                date_str, desc_part, amount_str = match.groups()
+                current = (date_str, [desc_part.strip()], amount_str)
+            elif current:
+                current[1].append(line.strip())
+        if current:
+            rows.append(_boa_row(current[0], ' '.join(current[1]), current[2]))
+    block = re.search(r'Service fees - continued\n(.*?)\nTotal service fees', full_text, re.DOTALL)
+    if block:
+        for date_str, desc, amount_str in BOA_FEE_ENTRY.findall(block.group(1)):
+            rows.append(_boa_row(date_str, ' '.join(desc.split()), amount_str, 'signed_nonzero'))
+    return rows
+
+def run_check(statements=6, pages=3, txns=30):
+    """Prints one line per statement; returns True when every statement matches."""
+    from utils.bank_parsers import iter_bank_of_america_transactions
+    from utils.statement_document import StatementDocument
+    from utils.transactions import TransactionBatch, normalize_transactions
+
+    def normalized(rows):
+        batch = TransactionBatch()
+        for row in rows:
+            batch.add(*row)
+        return normalize_transactions(batch)
+
+    failed = []
+    for seed in range(statements):
+        n_pages = 1 + seed % pages
+        data = synthetic.boa_statement(pages=n_pages, txns_per_page=txns, seed=seed)
+        document = StatementDocument(f"boa-{seed}.pdf", data)
+        streamed = normalized(iter_bank_of_america_transactions(document))
+        expected = normalized(reference_rows(document))
+        ok = streamed.equals(expected)
+        print(f"statement {seed}: {n_pages} pages, {len(streamed)} rows (reference {len(expected)}) "
+              f"{'ok' if ok else 'MISMATCH'}")
+        if not ok:
+            failed.append(seed)
+    return not failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Bank of America parser output check.")
+    parser.add_argument("--statements", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--txns", type=int, default=30)
+    args = parser.parse_args()
+    sys.exit(0 if run_check(args.statements, args.pages, args.txns) else 1)
+
+if __name__ == "__main__":
+    main()
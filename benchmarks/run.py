@@ -0,0 +1,307 @@
+"""
+Offline benchmark suite for the parsing, document and valuation stages.
+
+Every input is generated synthetically (see benchmarks/synthetic.py), so
+no client data or network access is needed. Each stage is run --repeat
+times and the median is recorded.
+
+    python -m benchmarks.run                          # run and print
+    python -m benchmarks.run --save baseline          # store benchmarks/results/baseline.json
+    python -m benchmarks.run --compare baseline       # fail if any stage is >20% slower
+    python -m benchmarks.run --only parse --pages 50  # subset, larger statements
+    python -m benchmarks.run --skip-checks            # timings only
+
+After the timings, the output checks (check_boa_parser and
+stress_valuation_reports) run at their default sizes; any failure makes
+the run exit non-zero.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or None
+    except OSError:
+        return None
+
+# --- Stages ---
+# Each builder takes the parsed CLI args and a scratch directory and returns
+# (callable, items), where `items` is a count reported alongside the timing
+# (pages, rows, paragraphs...). Inputs are generated before timing starts.
+
+def stage_parse_bank_of_america(args, tmp):
+    from utils.bank_parsers import parse_bank_of_america
+    from utils.statement_document import StatementDocument
+
+    data = synthetic.boa_statement(pages=args.pages, txns_per_page=args.txns)
+    return (lambda: parse_bank_of_america(StatementDocument("boa.pdf", data))), args.pages
+
+def stage_parse_td_generic(args, tmp):
+    from utils.bank_parsers import parse_td_generic
+    from utils.statement_document import StatementDocument
+
+    data = synthetic.td_deposit_statement(txns_per_section=min(args.txns, 20), pages=args.pages)
+    return (lambda: parse_td_generic(StatementDocument("td.pdf", data), "TD Business Convenience Plus",
+                                     ["Electronic Deposits"], ["Electronic Payments"])), args.pages
+
+def stage_parse_td_visa_card(args, tmp):
+    from utils.bank_parsers import parse_td_visa_card
+    from utils.statement_document import StatementDocument
+
+    data = synthetic.td_visa_statement(pages=args.pages, txns_per_page=args.txns)
+    return (lambda: parse_td_visa_card(StatementDocument("visa.pdf", data))), args.pages
+
+def stage_normalize_transactions(args, tmp):
+    from utils.bank_parsers import parse_bank_of_america
+    from utils.statement_document import StatementDocument
+    from utils.transactions import TransactionBatch, normalize_transactions
+
+    one = parse_bank_of_america(StatementDocument("boa.pdf", synthetic.boa_statement(pages=2, txns_per_page=args.txns)))
+    batch = TransactionBatch()
+    while len(batch) < args.rows:
+        batch.extend(one)
+    return (lambda: normalize_transactions(batch)), len(batch)
+
+def stage_reconcile_transactions(args, tmp):
+    from utils.reconciliation import reconcile_transactions
+
+    df = synthetic.consolidated_transactions(rows=args.rows)
+    return (lambda: reconcile_transactions(df)), len(df)
+
+def stage_categorize_transactions(args, tmp):
+    from utils.categorization import compile_rules
+
+    rules = compile_rules(synthetic.category_rules())
+    df = synthetic.consolidated_transactions(rows=args.rows)
+    return (lambda: rules.categorize(df['Description'], df['Amount'])), len(df)
+
+def stage_export_xlsx(args, tmp):
+    import numpy as np
+    import pandas as pd
+    from utils.exports import export_transactions
+
+    n = args.rows
+    df = pd.DataFrame({
+        'Bank': ['Bank of America'] * n,
+        'Date': pd.date_range('2024-01-01', periods=n, freq='min'),
+        'Ref': [''] * n,
+        'Description': ['SYNTHETIC PAYMENT'] * n,
+        'Amount': np.random.default_rng(0).normal(0, 1000, n).round(2),
+    })
+    return (lambda: export_transactions(df, "xlsx")), n
+
+def stage_process_word_template(args, tmp):
+    from utils.doc_utils import process_word_template
+
+    path = os.path.join(tmp, "letter.docx")
+    with open(path, "wb") as f:
+        f.write(synthetic.word_template(paragraphs=args.paragraphs))
+    image = synthetic.table_image()
+    context = synthetic.placeholder_context()
+
+    def run():
+        doc = process_word_template(path, context, provided_image_stream=io.BytesIO(image))
+        doc.save(io.BytesIO())
+    return run, args.paragraphs
+
+def stage_load_nav_table(args, tmp):
+    from utils.valuation_utils import load_nav_table
+    from utils.workbooks import ValuationWorkbook
+
+    data = synthetic.nav_workbook(rows=args.nav_rows, extra_sheets=args.extra_sheets)
+    # A fresh ValuationWorkbook each run: cold sheet index and sheet parse, no memo
+    return (lambda: load_nav_table(ValuationWorkbook(data))), args.nav_rows
+
+def stage_generate_nav_table_image(args, tmp):
+    from utils.valuation_utils import clear_nav_image_cache, generate_nav_table_image
+
+    data = synthetic.nav_workbook(rows=args.nav_rows, extra_sheets=args.extra_sheets)
+
+    def run():
+        # Cold render; the cached path is timed by nav_table_image_cached
+        clear_nav_image_cache()
+        generate_nav_table_image(io.BytesIO(data))
+    return run, args.nav_rows
+
+def stage_nav_table_image_cached(args, tmp):
+    from utils.valuation_utils import generate_nav_table_image
+
+    data = synthetic.nav_workbook(rows=args.nav_rows, extra_sheets=args.extra_sheets)
+    return (lambda: generate_nav_table_image(io.BytesIO(data))), args.nav_rows
+
+def stage_generate_valuation_report(args, tmp):
+    from utils.valuation_utils import generate_nav_table_image, generate_valuation_report
+
+    path = os.path.join(tmp, "valuation_report_template.docx")
+    with open(path, "wb") as f:
+        f.write(synthetic.valuation_report_template(paragraphs=args.paragraphs))
+    image = generate_nav_table_image(io.BytesIO(synthetic.nav_workbook(rows=args.nav_rows)))
+    return (lambda: generate_valuation_report(path, synthetic.valuation_context(), image)), args.paragraphs
+
+def stage_generate_valuation_report_native(args, tmp):
+    from utils.valuation_utils import generate_valuation_report, load_nav_table
+
+    path = os.path.join(tmp, "valuation_report_native.docx")
+    with open(path, "wb") as f:
+        f.write(synthetic.valuation_report_template(paragraphs=args.paragraphs, nav_tag="nav_table"))
+    data = synthetic.nav_workbook(rows=args.nav_rows)
+    # Same work as the Valuations page: load the sheet, write it as a Word table
+    return (lambda: generate_valuation_report(path, synthetic.valuation_context(),
+                                              nav_table=load_nav_table(io.BytesIO(data)))), args.nav_rows
+
+def stage_dcf_sensitivity_grid(args, tmp):
+    from utils.dcf import exit_multiple_grid, grid_axis, load_cash_flow_projection, sensitivity_grid
+
+    projection = load_cash_flow_projection(synthetic.dcf_workbook(years=args.dcf_years))
+    waccs = grid_axis(0.12, 0.001, args.grid)
+
+    def run():
+        sensitivity_grid(projection, waccs, grid_axis(0.04, 0.0005, args.grid), net_debt=1e7)
+        exit_multiple_grid(projection, waccs, grid_axis(10.0, 0.1, args.grid), net_debt=1e7)
+    return run, 2 * len(waccs) ** 2
+
+def stage_monte_carlo_dcf(args, tmp):
+    from utils.monte_carlo import simulate_dcf
+
+    specs = {
+        'revenue_growth': ('normal', 0.08, 0.03),
+        'fcf_margin': ('normal', 0.15, 0.02),
+        'wacc': ('triangular', 0.10, 0.12, 0.14),
+        'terminal_growth': ('uniform', 0.03, 0.05),
+    }
+    return (lambda: simulate_dcf(1e8, args.dcf_years, specs, args.scenarios, seed=0)), args.scenarios
+
+STAGES = {
+    "parse_bank_of_america": stage_parse_bank_of_america,
+    "parse_td_generic": stage_parse_td_generic,
+    "parse_td_visa_card": stage_parse_td_visa_card,
+    "normalize_transactions": stage_normalize_transactions,
+    "reconcile_transactions": stage_reconcile_transactions,
+    "categorize_transactions": stage_categorize_transactions,
+    "export_xlsx": stage_export_xlsx,
+    "process_word_template": stage_process_word_template,
+    "load_nav_table": stage_load_nav_table,
+    "generate_nav_table_image": stage_generate_nav_table_image,
+    "nav_table_image_cached": stage_nav_table_image_cached,
+    "generate_valuation_report": stage_generate_valuation_report,
+    "generate_valuation_report_native": stage_generate_valuation_report_native,
+    "dcf_sensitivity_grid": stage_dcf_sensitivity_grid,
+    "monte_carlo_dcf": stage_monte_carlo_dcf,
+}
+
+def time_stage(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_suite(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, builder in STAGES.items():
+            if args.only and not any(key in name for key in args.only):
+                continue
+            fn, items = builder(args, tmp)
+            fn()  # warm-up: first-use imports are measured by bench_startup
+            timings = time_stage(fn, args.repeat)
+            results[name] = {
+                "median_s": round(statistics.median(timings), 5),
+                "min_s": round(min(timings), 5),
+                "items": items,
+            }
+            rate = items / results[name]["median_s"] if results[name]["median_s"] else float("inf")
+            print(f"{name:>32}: {results[name]['median_s']:.4f}s median ({items} items, {rate:,.0f}/s)", flush=True)
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("save", "compare", "only", "skip_checks")},
+        "stages": results,
+    }
+
+def _results_path(name):
+    return name if name.endswith(".json") else os.path.join(RESULTS_DIR, f"{name}.json")
+
+def compare(current, baseline, tolerance):
+    """Prints per-stage ratios against a baseline; returns the regressed stage names."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit')} (tolerance {tolerance:.0%}):")
+    for name, stats in current["stages"].items():
+        base = baseline["stages"].get(name)
+        if not base:
+            print(f"{name:>32}: no baseline")
+            continue
+        ratio = stats["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{name:>32}: {base['median_s']:.4f}s -> {stats['median_s']:.4f}s ({ratio:.2f}x) {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+# --- Checks ---
+
+def run_checks():
+    """Runs the output checks; returns True when all pass."""
+    from benchmarks import check_boa_parser, stress_valuation_reports
+
+    print("\nBank of America parser vs the joined-text reference:")
+    parser_ok = check_boa_parser.run_check()
+    print("\nConcurrent valuation reports:")
+    reports_ok = stress_valuation_reports.run_checks()
+    return parser_ok and reports_ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite.")
+    parser.add_argument("--pages", type=int, default=5, help="pages per synthetic statement")
+    parser.add_argument("--txns", type=int, default=40, help="transactions per statement page")
+    parser.add_argument("--rows", type=int, default=20000, help="rows for normalization/export stages")
+    parser.add_argument("--paragraphs", type=int, default=200, help="paragraphs per DOCX template")
+    parser.add_argument("--nav-rows", type=int, default=30, help="rows in the NAV sheet")
+    parser.add_argument("--extra-sheets", type=int, default=0, help="filler sheets in the NAV workbook")
+    parser.add_argument("--grid", type=int, default=101, help="points per axis of the DCF sensitivity grids")
+    parser.add_argument("--scenarios", type=int, default=200000, help="Monte Carlo scenarios")
+    parser.add_argument("--dcf-years", type=int, default=10, help="projection years in the DCF workbook")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="run stages whose name contains any of these")
+    parser.add_argument("--save", help="store results as benchmarks/results/<name>.json (or a .json path)")
+    parser.add_argument("--compare", help="baseline name or .json path to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    parser.add_argument("--skip-checks", action="store_true", help="skip the output and concurrency checks")
+    args = parser.parse_args()
+
+    current = run_suite(args)
+
+    if args.save:
+        path = _results_path(args.save)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nSaved results to {path}")
+
+    regressed = False
+    if args.compare:
+        with open(_results_path(args.compare)) as f:
+            baseline = json.load(f)
+        regressed = bool(compare(current, baseline, args.tolerance))
+
+    checks_ok = args.skip_checks or run_checks()
+    if regressed or not checks_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Concurrency check for generate_valuation_report.
+
+Renders many NAV reports at once from a thread pool, as several analysts
+clicking "Generate NAV Report" would, each with its own table image
+(uploaded, or drawn with Matplotlib from its own NAV sheet) and NAV sheet,
+and checks that every output carries its own image and table rather than
+another session's. Exits non-zero on any mix-up.
+
+    python -m benchmarks.stress_valuation_reports
+    python -m benchmarks.stress_valuation_reports --reports 64 --threads 16
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import synthetic
+
+def _embedded_images(docx_io):
+    from docx import Document
+
+    doc = Document(docx_io)
+    return {hashlib.sha256(rel.target_part.blob).hexdigest()
+            for rel in doc.part.rels.values() if "image" in rel.reltype}
+
+def _first_table_row(docx_io):
+    from docx import Document
+
+    tables = Document(docx_io).tables
+    return [c.text for c in tables[0].rows[1].cells] if tables else None
+
+def _run_all(run, reports, threads):
+    """Indices of the reports that came out wrong or raised."""
+    def safe(i):
+        try:
+            return run(i)
+        except Exception as e:
+            print(f"report {i}: {type(e).__name__}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return [i for i, ok in enumerate(executor.map(safe, range(reports))) if not ok]
+
+def check_image_reports(path, reports, threads):
+    from utils.valuation_utils import generate_valuation_report
+
+    # Distinct images; small so the run measures the report path, not PNG encoding
+    images = [synthetic.table_image(width=400, height=200, seed=i) for i in range(reports)]
+
+    def run(i):
+        context = synthetic.valuation_context()
+        context['company'] = f"Client {i}"
+        out = generate_valuation_report(path, context, io.BytesIO(images[i]))
+        return hashlib.sha256(images[i]).hexdigest() in _embedded_images(out)
+
+    return _run_all(run, reports, threads)
+
+def check_rendered_image_reports(path, reports, threads):
+    from utils.valuation_utils import (
+        clear_nav_image_cache, generate_valuation_report, load_nav_table, render_nav_table_image)
+
+    # Distinct tables, so every report misses the image cache and draws its
+    # own figure; the reference images are drawn one at a time first
+    tables = [load_nav_table(io.BytesIO(synthetic.nav_workbook(rows=5, seed=i))) for i in range(reports)]
+    clear_nav_image_cache()
+    expected = [hashlib.sha256(render_nav_table_image(df, dpi=100).getvalue()).hexdigest() for df in tables]
+    clear_nav_image_cache()
+
+    def run(i):
+        image = render_nav_table_image(tables[i], dpi=100)
+        out = generate_valuation_report(path, synthetic.valuation_context(), image)
+        return expected[i] in _embedded_images(out)
+
+    try:
+        return _run_all(run, reports, threads)
+    finally:
+        clear_nav_image_cache()
+
+def check_table_reports(path, reports, threads):
+    from utils.valuation_utils import generate_valuation_report, load_nav_table
+    from utils.word_tables import format_cell
+
+    tables = [load_nav_table(io.BytesIO(synthetic.nav_workbook(rows=5, seed=i))) for i in range(reports)]
+
+    def run(i):
+        out = generate_valuation_report(path, synthetic.valuation_context(), nav_table=tables[i])
+        return _first_table_row(out) == [format_cell(v) for v in tables[i].iloc[0]]
+
+    return _run_all(run, reports, threads)
+
+def run_checks(reports=32, threads=8):
+    """Prints one line per check; returns True when no report was mixed up."""
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # Run from the scratch dir so any file the report path writes to the
+        # working directory would be shared between threads, as in the app
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            checks = (("nav_image", "nav_image", check_image_reports),
+                      ("nav_render", "nav_image", check_rendered_image_reports),
+                      ("nav_table", "nav_table", check_table_reports))
+            for name, tag, check in checks:
+                path = os.path.join(tmp, f"{name}.docx")
+                with open(path, "wb") as f:
+                    f.write(synthetic.valuation_report_template(paragraphs=20, nav_tag=tag))
+                start = time.perf_counter()
+                mismatched = check(path, reports, threads)
+                elapsed = time.perf_counter() - start
+                print(f"{name:>10}: {reports} reports on {threads} threads in {elapsed:.2f}s, "
+                      f"{len(mismatched)} mismatched {mismatched or ''}")
+                failed = failed or bool(mismatched)
+            leftovers = os.listdir(tmp)
+        finally:
+            os.chdir(cwd)
+    stray = [name for name in leftovers if not name.endswith(".docx")]
+    if stray:
+        print(f"Files left in the working directory: {stray}")
+    return not (failed or stray)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent valuation report check.")
+    parser.add_argument("--reports", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    sys.exit(0 if run_checks(args.reports, args.threads) else 1)
+
+if __name__ == "__main__":
+    main()
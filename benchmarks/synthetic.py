@@ -0,0 +1,312 @@
+"""
+Synthetic inputs for the offline benchmarks.
+PDFs are drawn with matplotlib's PDF backend (TrueType fonts, so pdfplumber
+and camelot can read the text back) in the layouts the parsers expect.
+"""
+import io
+import random
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+PAGE_W, PAGE_H = 8.5, 11.0
+LINE_H = 0.18  # inches
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+def render_pdf(pages, font_size=8):
+    """
+    Renders pages to PDF bytes. Each page is a list of lines; each line is
+    a list of (x in inches, text) items, or a plain string at the left margin.
+    """
+    buf = io.BytesIO()
+    with matplotlib.rc_context({"pdf.fonttype": 42}), PdfPages(buf) as pdf:
+        for lines in pages:
+            fig = plt.figure(figsize=(PAGE_W, PAGE_H))
+            for i, line in enumerate(lines):
+                y = 1 - (0.5 + i * LINE_H) / PAGE_H
+                items = [(0.5, line)] if isinstance(line, str) else line
+                for x, text in items:
+                    fig.text(x / PAGE_W, y, text, fontsize=font_size, family="DejaVu Sans")
+            pdf.savefig(fig)
+            plt.close(fig)
+    return buf.getvalue()
+
+VENDORS = ["AMAZON WEB SERVICES", "STAPLES", "UBER TRIP", "DELTA AIR", "OFFICE DEPOT", "ZOOM.US", "SHELL OIL"]
+
+def _vendor(rng):
+    return rng.choice(VENDORS)
+
+# --- TD VISA ---
+
+VISA_COLUMNS = {"posting": 0.5, "activity": 1.5, "ref": 2.6, "desc": 4.2, "amount": 7.3}
+
+def td_visa_statement(pages=3, txns_per_page=30, year=2024, seed=0):
+    """
+    TD Business Solutions VISA layout: two summary pages, then an activity
+    table ("Posting Date / Activity Date / Reference Number / Description /
+    Amount") starting on page 3 and continuing on every following page.
+    """
+    rng = random.Random(seed)
+    c = VISA_COLUMNS
+    out = [
+        ["TD BUSINESS SOLUTIONS VISA", f"Statement Period: Jan 01 {year} to Jan 31 {year}", "Account Summary"],
+        ["Important information about your account"],
+    ]
+    for _ in range(max(pages - 2, 1)):
+        lines = [
+            "Transaction Activity",
+            [(c["posting"], "Posting Date"), (c["activity"], "Activity Date"), (c["ref"], "Reference Number"),
+             (c["desc"], "Description"), (c["amount"], "Amount($)")],
+        ]
+        for _ in range(txns_per_page):
+            month = MONTHS[rng.randrange(12)]
+            day = rng.randint(1, 28)
+            amount = f"{rng.uniform(1, 5000):,.2f}"
+            if rng.random() < 0.1:
+                amount += " CR"
+            lines.append([
+                (c["posting"], f"{month} {day:02d}"), (c["activity"], f"{month} {day:02d}"),
+                (c["ref"], f"{rng.randrange(10**11, 10**12)}"), (c["desc"], f"{_vendor(rng)} #{rng.randrange(1000)}"),
+                (c["amount"], amount),
+            ])
+        out.append(lines)
+    return render_pdf(out)
+
+# --- Bank of America ---
+
+def boa_statement(pages=3, txns_per_page=40, year=2024, seed=0):
+    """
+    Bank of America checking layout: a withdrawals section spanning all
+    pages (with multi-line descriptions) followed by service fees, two of
+    which wrap (after the date, before the amount) onto a second line.
+    """
+    rng = random.Random(seed)
+    yy = year % 100
+    out = []
+    for p in range(pages):
+        lines = []
+        if p == 0:
+            lines += ["Bank of America", "Your Business Advantage Fundamentals Banking",
+                      f"for January 1, {year} - January 31, {year}", "Withdrawals and other debits"]
+        else:
+            lines += ["Withdrawals and other debits - continued"]
+        for _ in range(txns_per_page):
+            lines.append(f"01/{rng.randint(1, 28):02d}/{yy:02d} {_vendor(rng)} DES:PAYMENT ID:{rng.randrange(10**6)} -{rng.uniform(1, 9000):,.2f}")
+            if rng.random() < 0.3:
+                lines.append(f"CONF# {rng.randrange(10**9)}")
+        if p == pages - 1:
+            lines += [
+                "Total withdrawals and other debits -1.00",
+                "Service fees - continued",
+                f"01/31/{yy:02d} Monthly Maintenance Fee -16.00",
+                f"01/31/{yy:02d} Wire Transfer Fee 0.00",
+                f"01/31/{yy:02d}",
+                "Outgoing Wire Transfer Fee -30.00",
+                f"01/31/{yy:02d} Overdraft Item Fee",
+                "-35.00",
+                "Total service fees -81.00",
+            ]
+        out.append(lines)
+    return render_pdf(out)
+
+# --- TD deposit accounts (parse_td_generic) ---
+
+def td_deposit_statement(product="TD Business Convenience Plus", credit_headers=("Electronic Deposits",),
+                         debit_headers=("Electronic Payments",), txns_per_section=10, pages=2, year=2024, seed=0):
+    """
+    TD deposit account layout: the activity sections (header, POSTING DATE
+    line, rows, Subtotal) are all on page 1, which is all the parser reads.
+    Extra pages hold filler text.
+    """
+    rng = random.Random(seed)
+    first = [product, f"Statement Period: Jan 01 {year}-Jan 31 {year}", "DAILY ACCOUNT ACTIVITY"]
+    for header in list(credit_headers) + list(debit_headers):
+        first += [header, "POSTING DATE DESCRIPTION AMOUNT"]
+        for _ in range(txns_per_section):
+            first.append(f"01/{rng.randint(1, 28):02d} {_vendor(rng)} {rng.randrange(10**6)} {rng.uniform(1, 9000):,.2f}")
+        first.append(f"Subtotal: {rng.uniform(1000, 90000):,.2f}")
+    out = [first]
+    for _ in range(pages - 1):
+        out.append(["Important information about your account"] + ["Lorem ipsum dolor sit amet"] * 20)
+    return render_pdf(out)
+
+# --- Consolidated transactions ---
+
+def consolidated_transactions(rows=20000, transfer_share=0.1, overlap_share=0.1, seed=0):
+    """
+    A normalized transactions frame (with Source) from three accounts:
+    a share of the rows are card payments that appear on both sides
+    within a few days, and a share are repeated by an overlapping statement.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    base = int(rows / (1 + transfer_share + overlap_share))
+    banks = np.array(["Bank of America", "TD BUSINESS SOLUTIONS VISA", "TD Business Convenience Plus"])
+    frame = pd.DataFrame({
+        'Bank': banks[rng.integers(0, 3, base)],
+        'Date': pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, base), unit="D"),
+        'Ref': "",
+        # Vendor plus a reference number, so nearly every description is distinct
+        'Description': [f"{v} {r} POS PURCHASE" for v, r in zip(rng.choice(VENDORS + ["MERCHANT 42"], base),
+                                                                rng.integers(10000, 99999, base))],
+        'Amount': rng.normal(-200, 400, base).round(2),
+        'Source': [f"statement_{m:02d}.pdf" for m in rng.integers(1, 13, base)],
+    })
+    payments = frame[frame['Amount'] < 0].head(int(base * transfer_share))
+    credits = payments.assign(Bank=banks[1], Amount=-payments['Amount'], Description="PAYMENT - THANK YOU",
+                              Date=payments['Date'] + pd.to_timedelta(rng.integers(0, 4, len(payments)), unit="D"),
+                              Source="visa_statement.pdf")
+    overlap = frame.sample(frac=overlap_share, random_state=seed).assign(Source="overlapping_statement.pdf")
+    out = pd.concat([frame, credits, overlap], ignore_index=True)
+    return out.sort_values('Date', kind='stable').reset_index(drop=True)
+
+def category_rules(rules=40, keywords_per_rule=5):
+    """A parsed category rule file: keyword rules (including the synthetic vendors), regex and amount rules."""
+    spec = [
+        {'category': 'Inter-account Transfer', 'keywords': ['PAYMENT - THANK YOU'], 'regex': r'TRANSFER (TO|FROM) \w+'},
+        {'category': 'Bank Charges', 'keywords': ['SERVICE FEE', 'WIRE FEE'], 'max_amount': 0},
+    ]
+    for i in range(rules):
+        keywords = [f"MERCHANT {i * keywords_per_rule + j}" for j in range(keywords_per_rule)]
+        if i < len(VENDORS):
+            keywords.append(VENDORS[i])
+        spec.append({'category': f"GL {6000 + i}", 'keywords': keywords})
+    spec.append({'category': 'Large Payment', 'max_amount': -10000})
+    return {'default': 'Uncategorized', 'rules': spec}
+
+# --- Valuation workbooks ---
+
+def nav_workbook(rows=30, cols=4, extra_sheets=0, extra_sheet_rows=500, seed=0):
+    """
+    Workbook with a 'NAV Calculation Working' sheet (label column plus
+    numeric columns) and optional filler sheets, as xlsx bytes.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    nav = pd.DataFrame(rng.uniform(-1e6, 1e7, size=(rows, cols)).round(2),
+                       columns=[f"FY{2020 + i}" for i in range(cols)])
+    nav.insert(0, "Particulars", [f"Line item {i + 1}" for i in range(rows)])
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        for i in range(extra_sheets):
+            pd.DataFrame(rng.uniform(0, 1e6, size=(extra_sheet_rows, 12))).to_excel(writer, sheet_name=f"Model {i + 1}", index=False)
+        nav.to_excel(writer, sheet_name="NAV Calculation Working", index=False)
+    return buf.getvalue()
+
+def dcf_workbook(years=5, seed=0):
+    """Workbook with a 'DCF Projections' sheet: Revenue, EBITDA and Free Cash Flow per year."""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    revenue = 1e8 * np.cumprod(1 + rng.uniform(0.05, 0.15, years))
+    ebitda = revenue * rng.uniform(0.18, 0.25, years)
+    fcf = ebitda * rng.uniform(0.45, 0.6, years)
+    sheet = pd.DataFrame([revenue, ebitda, fcf], columns=[f"FY{2025 + i}" for i in range(years)]).round(0)
+    sheet.insert(0, "Particulars", ["Revenue", "EBITDA", "Free Cash Flow"])
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+        sheet.to_excel(writer, sheet_name="DCF Projections", index=False)
+    return buf.getvalue()
+
+# --- Auth config ---
+
+def auth_config(users=20):
+    """config.yaml text in the app's format, with bcrypt-hashed passwords."""
+    import streamlit_authenticator as stauth
+    import yaml
+
+    password = stauth.Hasher.hash("synthetic-password")
+    usernames = {f"user{i}": {"email": f"user{i}@example.com", "name": f"Synthetic User {i}", "password": password}
+                 for i in range(users)}
+    return yaml.safe_dump({
+        "credentials": {"usernames": usernames},
+        "cookie": {"expiry_days": 30, "key": "synthetic_signature_key", "name": "synthetic_cookie"},
+        "preauthorized": {"emails": []},
+    })
+
+# --- Word templates ---
+
+PLACEHOLDERS = ["<<company>>", "<<company_caps>>", "<<address>>", "<<authority>>", "<<designation>>",
+                "<<date>>", "<<valuation_date>>", "<<group_designation>>", "<<valuation_type_statement>>"]
+
+def placeholder_context():
+    return {p: f"value for {p.strip('<>')}" for p in PLACEHOLDERS}
+
+def word_template(paragraphs=100, tables=2, table_rows=10, image_placeholder=True):
+    """A .docx in the style of templates/: '<<key>>' placeholders in body text and tables."""
+    from docx import Document
+
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i} for {PLACEHOLDERS[i % len(PLACEHOLDERS)]} dated <<date>>.")
+        if image_placeholder and i == paragraphs // 2:
+            doc.add_paragraph("<<valuation.jpg>>")
+    for _ in range(tables):
+        tbl = doc.add_table(rows=table_rows, cols=2)
+        for r, row in enumerate(tbl.rows):
+            row.cells[0].text = f"Row {r}"
+            row.cells[1].text = PLACEHOLDERS[r % len(PLACEHOLDERS)]
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def valuation_report_template(paragraphs=50, nav_tag="nav_image"):
+    """
+    A docxtpl template like the NAV report, with the image tag
+    {{ nav_image }}. nav_tag="nav_table" gives the native Word table tag
+    instead.
+    """
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph("{{company}} - Valuation as on {{valuation_date}}")
+    doc.add_paragraph("To: {{directed_to}}, {{appointing_company}}, {{appointing_company_address}}")
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Section {i}: prepared for {{{{company}}}}.")
+    doc.add_paragraph(f"{{{{ {nav_tag} }}}}")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def dcf_report_template():
+    """A docxtpl template with the DCF summary, sensitivity and simulation table tags."""
+    from docx import Document
+
+    doc = Document()
+    doc.add_paragraph("{{company}} - DCF valuation as on {{valuation_date}}")
+    for tag in ("dcf_summary", "dcf_sensitivity", "dcf_exit_sensitivity", "mc_percentiles", "mc_histogram"):
+        doc.add_paragraph(f"{{{{ {tag} }}}}")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def valuation_context():
+    return {
+        'valuation_date': "31-Mar-2024",
+        'company': "Synthetic Client Pvt Ltd",
+        'directed_to': "The Board of Directors",
+        'appointing_company': "Shareholder's Firm",
+        'appointing_company_address': "Kolkata, West Bengal",
+        'appointing_company_3line_address': "123 Street Name,\nDistrict,\nCity - 700001",
+    }
+
+def table_image(width=2400, height=1200, seed=0):
+    """A PNG resembling an uploaded valuation-table screenshot."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 40):
+        draw.line([(0, y), (width, y)], fill=(200, 200, 200))
+        draw.text((20, y + 10), f"Row {y // 40}  {rng.uniform(0, 1e6):,.2f}", fill="black")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
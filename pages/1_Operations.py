@@ -1,17 +1,22 @@
 import streamlit as st
-import pandas as pd
-import io
+import os
 from utils.auth_manager import require_auth
 # Import logic from our new utils folder
 from utils.bank_parsers import (
-    parse_bank_of_america, 
-    parse_td_visa_card, 
-    parse_td_generic
+    PARSER_REGISTRY,
+    consolidate_statements,
+    detect_bank_type
 )
+from utils.exports import EXPORT_FORMATS, export_transactions
+from utils.reconciliation import TRANSFER_WINDOW_DAYS
+from utils.categorization import RULES_PATH, categorize_transactions, load_rules
+from utils.jobs import job_owner, job_process_workers, submit_job, watch_job
+from utils.perf import perf_run, profile_requested, show_perf_panel
 
 st.set_page_config(page_title="Operations", page_icon="🏦", layout="wide")
 
 require_auth()
+show_perf_panel(job_owner())
 
 st.title("Operations & Reconciliation")
 st.markdown("### Bank Statement Consolidator")
@@ -20,88 +25,176 @@ st.markdown("### Bank Statement Consolidator")
 if 'file_selections' not in st.session_state:
     st.session_state.file_selections = {}
 
+# Banks detected from each upload's first page (detection runs once per file)
+if 'detected_banks' not in st.session_state:
+    st.session_state.detected_banks = {}
+
 # Initialize session state for the processed dataframe
 if 'processed_data' not in st.session_state:
     st.session_state.processed_data = None
 
+# Exports are built once per result version and reused across reruns
+if 'processed_version' not in st.session_state:
+    st.session_state.processed_version = 0
+if 'export_cache' not in st.session_state:
+    st.session_state.export_cache = {}
+# (result version, rule file stamp) -> categorized frame; only the latest is kept
+if 'categorized' not in st.session_state:
+    st.session_state.categorized = (None, None)
+
 out_name = st.text_input("Output Filename", "consolidated_summary.xlsx")
 uploaded_files = st.file_uploader("Upload PDFs", type="pdf", accept_multiple_files=True)
 
-bank_opts = [
-    "Select...", 
-    "Bank of America", 
-    "TD Business Convenience Plus", 
-    "TD BUSINESS SOLUTIONS VISA", 
-    "TD Small Business Premium Money Mar"
-]
+# New banks are added by registering a parser class in utils/bank_parsers.py
+bank_opts = ["Select..."] + sorted(PARSER_REGISTRY)
 
 if uploaded_files:
     st.divider()
     st.subheader("Assign Banks")
     for f in uploaded_files:
         col_a, col_b = st.columns([2,3])
-        with col_a: st.write(f"📄 {f.name}")
+        if f.name not in st.session_state.detected_banks:
+            st.session_state.detected_banks[f.name] = detect_bank_type(f)
+        detected = st.session_state.detected_banks[f.name]
+
+        with col_a:
+            st.write(f"📄 {f.name}")
+            if detected:
+                st.caption(f"Detected: {detected}")
+            else:
+                st.caption("Bank not detected, please select it.")
         with col_b:
             # Use f.name as key
             if f.name not in st.session_state.file_selections:
-                st.session_state.file_selections[f.name] = "Select..."
+                st.session_state.file_selections[f.name] = detected or "Select..."
             
             st.session_state.file_selections[f.name] = st.selectbox(
                 "Bank Type", 
                 bank_opts, 
+                index=bank_opts.index(st.session_state.file_selections[f.name]),
                 key=f.name, 
                 label_visibility="collapsed"
             )
     
+    # Parsing options
+    with st.expander("Processing Options"):
+        parallel_mode = st.checkbox(
+            "Parse files in parallel",
+            value=len(uploaded_files) > 1,
+            help="Sends each statement to a separate worker process."
+        )
+        max_workers = st.number_input(
+            "Worker processes",
+            min_value=1,
+            max_value=job_process_workers(),
+            value=job_process_workers(),
+            help="Capped at this job's share of the CPUs, since other users' jobs run alongside it.",
+            disabled=not parallel_mode
+        )
+        use_cache = st.checkbox(
+            "Reuse cached results for previously parsed statements",
+            value=True,
+            help="Statements are matched by file content, not by name."
+        )
+        transfer_window = st.number_input(
+            "Transfer matching window (days)",
+            min_value=0,
+            max_value=30,
+            value=TRANSFER_WINDOW_DAYS,
+            help="An outflow and an inflow of the same amount on different accounts, "
+                 "at most this many days apart, are marked as one transfer."
+        )
+
     # Process Button
     if st.button("Process Files", type="primary"):
-        # Clear previous results to avoid confusion
-        st.session_state.processed_data = None
-        
         # Validation
         if any(st.session_state.file_selections[f.name] == "Select..." for f in uploaded_files):
             st.error("Please select a bank type for all files.")
         else:
-            all_txns = []
-            with st.spinner("Processing..."):
-                for f in uploaded_files:
-                    b_type = st.session_state.file_selections[f.name]
-                    f.seek(0) 
-                    
-                    if b_type == "Bank of America": 
-                        all_txns.extend(parse_bank_of_america(f))
-                    elif b_type == "TD BUSINESS SOLUTIONS VISA": 
-                        all_txns.extend(parse_td_visa_card(f))
-                    elif b_type == "TD Small Business Premium Money Mar": 
-                        all_txns.extend(parse_td_generic(f, b_type, ["Other Credits"], ["Electronic Payments", "Other Withdrawals"]))
-                    elif b_type == "TD Business Convenience Plus": 
-                        all_txns.extend(parse_td_generic(f, b_type, ["Electronic Deposits"], ["Electronic Payments"]))
-
-            if all_txns:
-                st.success(f"Success! Extracted {len(all_txns)} transactions.")
-                df = pd.DataFrame(all_txns, columns=['Bank', 'Date', 'Ref', 'Description', 'Amount'])
-                df['Date'] = pd.to_datetime(df['Date'])
-                df = df.sort_values(by='Date').reset_index(drop=True)
-                df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
-                
-                # SAVE TO SESSION STATE instead of creating button immediately
-                st.session_state.processed_data = df
-            else:
-                st.warning("No transactions found.")
-
-    # Show Download Button OUTSIDE the process button block
-    # This checks if data exists in memory and shows the button persistently
-    if st.session_state.processed_data is not None:
-        st.divider()
-        st.write("### Download Results")
-        
-        buffer = io.BytesIO()
-        st.session_state.processed_data.to_excel(buffer, index=False)
-        buffer.seek(0)
-        
-        st.download_button(
-            label="Download Excel File",
-            data=buffer,
-            file_name=out_name,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
\ No newline at end of file
+            # Parsing runs as a background job: the page stays responsive and
+            # the result survives a reconnect. Sequential mode is one worker.
+            jobs = [(f.name, f.getvalue(), st.session_state.file_selections[f.name]) for f in uploaded_files]
+            submit_job(
+                "statements", f"Parsing {len(jobs)} statement(s)", consolidate_statements, jobs,
+                max_workers=int(max_workers) if parallel_mode else 1, use_cache=use_cache,
+                transfer_window=int(transfer_window), track_progress=True
+            )
+
+# Progress of the latest parsing job; its result is picked up once when it finishes
+parse_job = watch_job("statements")
+if parse_job is not None and st.session_state.get("consumed_parse_job") != parse_job.id:
+    st.session_state.consumed_parse_job = parse_job.id
+    df, parse_errors = parse_job.result
+    for name, error in parse_errors:
+        st.error(f"Failed to parse {name}: {error}")
+
+    # Clear previous results to avoid confusion
+    st.session_state.processed_data = None
+    if not df.empty:
+        st.success(f"Success! Extracted {len(df)} transactions.")
+
+        # SAVE TO SESSION STATE instead of creating button immediately
+        st.session_state.processed_data = df
+        st.session_state.processed_version += 1
+        st.session_state.export_cache = {}
+    else:
+        st.warning("No transactions found.")
+
+# Show Download Button OUTSIDE the process button block
+# This checks if data exists in memory and shows the button persistently,
+# including after a reconnect (the uploads are gone, the job result is not)
+if st.session_state.processed_data is not None:
+    st.divider()
+    st.write("### Reconciliation")
+    df = st.session_state.processed_data
+    duplicates = df[df['Duplicate']]
+    transfers = df[df['Transfer'].notna()].sort_values(['Transfer', 'Amount'])
+    col_dup, col_xfer = st.columns(2)
+    col_dup.metric("Duplicate rows", len(duplicates), help="Repeated by an overlapping statement period.")
+    col_xfer.metric("Matched transfers", transfers['Transfer'].nunique(), help="Pairs of rows moving money between the accounts.")
+    if len(duplicates):
+        with st.expander("Duplicate rows"):
+            st.dataframe(duplicates)
+    if len(transfers):
+        with st.expander("Matched transfers"):
+            st.dataframe(transfers)
+    st.caption("The download keeps every row; filter on the Duplicate and Transfer columns.")
+
+    # Categories come from the rule file; an edited file applies on the next rerun
+    st.divider()
+    st.write("### Categorization")
+    rules_stamp = None
+    try:
+        rules_stamp, rules = load_rules()
+    except FileNotFoundError:
+        st.info(f"Add {RULES_PATH} to assign GL categories.")
+    except ValueError as e:
+        st.error(f"Categories not assigned, {RULES_PATH} has an error: {e}")
+    if rules_stamp is not None:
+        categorized_key = (st.session_state.processed_version, rules_stamp)
+        if st.session_state.categorized[0] != categorized_key:
+            with perf_run("categorize", job_owner(), profile_requested() or None):
+                st.session_state.categorized = (categorized_key, categorize_transactions(df, rules))
+        df = st.session_state.categorized[1]
+        summary = df.groupby('Category')['Amount'].agg(['count', 'sum']).sort_values('count', ascending=False)
+        st.caption(f"{len(rules)} rules from {RULES_PATH}; "
+                   f"{(df['Category'] != rules.default).sum()} of {len(df)} transactions categorized.")
+        st.dataframe(summary.rename(columns={'count': 'Transactions', 'sum': 'Amount'}))
+
+    st.divider()
+    st.write("### Download Results")
+    
+    export_label = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+    ext, mime = EXPORT_FORMATS[export_label]
+
+    cache_key = (st.session_state.processed_version, rules_stamp, ext)
+    if cache_key not in st.session_state.export_cache:
+        with st.spinner("Preparing download..."), perf_run("export", job_owner(), profile_requested() or None):
+            st.session_state.export_cache[cache_key] = export_transactions(df, ext)
+    
+    st.download_button(
+        label=f"Download {export_label.split(' ')[0]} File",
+        data=st.session_state.export_cache[cache_key],
+        file_name=f"{os.path.splitext(out_name)[0]}.{ext}",
+        mime=mime
+    )
\ No newline at end of file
@@ -1,15 +1,18 @@
 import streamlit as st
-import io
 import os
-import zipfile
 from utils.auth_manager import require_auth
-from utils.doc_utils import process_word_template
+from utils.doc_utils import DOCUMENT_TEMPLATES, build_base_context
+from utils.images import prepare_image
+from utils.bulk_docs import ROSTER_FIELDS, generate_bulk_archive, generate_documents, load_roster, roster_template_csv
+from utils.jobs import job_owner, job_process_workers, submit_job, watch_job
+from utils.perf import show_perf_panel
 
 st.set_page_config(page_title="Document Gen", page_icon="📝", layout="wide")
 
 # --- AUTHENTICATION CHECK ---
 require_auth()
 # ----------------------------
+show_perf_panel(job_owner())
 
 st.title("Document Generation Suite")
 st.markdown("### 1. Valuation Table Input")
@@ -21,6 +24,7 @@ st.info("Please upload the screenshot/image of your valuation table.")
 col_input, col_preview = st.columns([1, 1])
 
 uploaded_image_buffer = None
+prepared_image = None
 
 with col_input:
     uploaded_file = st.file_uploader(
@@ -30,12 +34,22 @@ with col_input:
     )
 
     if uploaded_file:
-        uploaded_image_buffer = uploaded_file
-        st.success("✅ Image uploaded successfully!")
+        # Downscaled/recompressed once per upload and reused by every document
+        try:
+            prepared_image = prepare_image(uploaded_file.getvalue())
+        except ValueError as e:
+            st.error(f"Could not use {uploaded_file.name}: {e}")
+        else:
+            uploaded_image_buffer = prepared_image.stream()
+            st.success("✅ Image uploaded successfully!")
+            st.caption(
+                f"Optimized for print: {prepared_image.original_size / 1024:,.0f} KB → "
+                f"{len(prepared_image.data) / 1024:,.0f} KB ({prepared_image.width}×{prepared_image.height} px)"
+            )
 
 with col_preview:
     if uploaded_image_buffer:
-        st.image(uploaded_image_buffer, caption="Preview: This image will be inserted", use_column_width=True)
+        st.image(prepared_image.data, caption="Preview: This image will be inserted", use_column_width=True)
     else:
         st.info("Waiting for image upload...")
 
@@ -79,11 +93,7 @@ with st.form("doc_gen_form"):
         address3 = st.text_input("Address Line 3", "New York, NY 10001")
             
     st.subheader("5. Select Documents to Generate")
-    doc_opts = {
-        "Board Resolution": "Board Resolution.docx",
-        "Engagement Letter": "Engagement Letter.docx",
-        "Management Rep Letter": "Management-representation-letter.docx"
-    }
+    doc_opts = DOCUMENT_TEMPLATES
     selected_docs = st.multiselect("Choose files:", list(doc_opts.keys()), default=list(doc_opts.keys()))
 
     submitted = st.form_submit_button("Generate Documents", type="primary")
@@ -99,93 +109,96 @@ if submitted:
     if uploaded_image_buffer is None:
         st.warning("⚠️ No image uploaded. The `<<valuation.jpg>>` section in the document will be empty.")
 
-    full_address = f"{address1}, {address2}, {address3}"
-    
     # Base Context
-    base_context = {
-        "<<company>>": company,
-        "<<company_caps>>": company.upper(),
-        "<<valuation_type_statement>>": valuation_statement,
-        "<<authority>>": authority,
-        "<<designation>>": designation,
-        "<<addressed_to>>": addressed_to,
-        "<<address_caps>>": full_address.upper(),
-        "<<address>>": full_address,
-        "<<address1>>": address1,
-        "<<address2>>": address2,
-        "<<address3>>": address3,
-        "<<group_designation>>": group_designation,
-        "<<authority_designation>>": designation,
-        "<<valuation_date>>": val_date.strftime("%d-%b-%Y"),
-        "<<br_date>>": br_date.strftime("%d-%b-%Y"),
-        "<<engagement_date>>": eng_date.strftime("%d-%b-%Y"),
-    }
+    base_context = build_base_context(
+        company, valuation_statement, authority, designation, addressed_to,
+        group_designation, address1, address2, address3,
+        val_date, br_date, eng_date
+    )
 
     template_dir = "templates"
     if not os.path.exists(template_dir):
         st.error(f"Error: '{template_dir}' folder not found.")
         st.stop()
 
-    generated_files = []
+    # Rendered as a background job; the download below survives reruns and reconnects
+    submit_job(
+        "documents", f"Generating {len(selected_docs)} document(s)", generate_documents,
+        base_context, selected_docs, template_dir,
+        prepared_image.data if prepared_image is not None else None
+    )
 
-    try:
-        for doc_name in selected_docs:
-            filename = doc_opts[doc_name]
-            file_path = os.path.join(template_dir, filename)
-            
-            if not os.path.exists(file_path):
-                st.error(f"Template not found: {filename}")
-                continue
-            
-            # Context Switching Logic for Dates
-            current_context = base_context.copy()
-            
-            if doc_name == "Management Rep Letter":
-                current_context["<<date>>"] = base_context["<<valuation_date>>"]
-            elif doc_name == "Board Resolution":
-                current_context["<<date>>"] = base_context["<<br_date>>"]
-            elif doc_name == "Engagement Letter":
-                current_context["<<date>>"] = base_context["<<engagement_date>>"]
-                current_context["<<date >>"] = base_context["<<engagement_date>>"]
-            else:
-                current_context["<<date>>"] = base_context["<<valuation_date>>"] 
-            
-            # Process Document
-            doc = process_word_template(
-                file_path, 
-                current_context, 
-                provided_image_stream=uploaded_image_buffer
-            )
-            
-            doc_io = io.BytesIO()
-            doc.save(doc_io)
-            doc_io.seek(0)
-            generated_files.append((f"Generated_{filename}", doc_io))
-
-        if not generated_files:
-            st.error("No files were generated.")
-        elif len(generated_files) == 1:
-            st.success("Document generated successfully!")
-            st.download_button(
-                label=f"Download {generated_files[0][0]}",
-                data=generated_files[0][1],
-                file_name=generated_files[0][0],
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-            )
-        else:
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zf:
-                for name, data in generated_files:
-                    zf.writestr(name, data.getvalue())
-            zip_buffer.seek(0)
-            
-            st.success(f"{len(generated_files)} documents generated successfully!")
-            st.download_button(
-                label="Download All (ZIP)",
-                data=zip_buffer,
-                file_name="generated_documents.zip",
-                mime="application/zip"
-            )
+docs_job = watch_job("documents")
+if docs_job is not None:
+    file_name, data, mime, generated, missing = docs_job.result
+    for filename in missing:
+        st.error(f"Template not found: {filename}")
+    if not generated:
+        st.error("No files were generated.")
+    elif generated == 1:
+        st.success("Document generated successfully!")
+        st.download_button(label=f"Download {file_name}", data=data, file_name=file_name, mime=mime)
+    else:
+        st.success(f"{generated} documents generated successfully!")
+        st.download_button(label="Download All (ZIP)", data=data, file_name=file_name, mime=mime)
 
+# ==================================================
+# SECTION D: BULK GENERATION FROM A CLIENT ROSTER
+# ==================================================
+st.divider()
+st.subheader("Bulk Generation from Client Roster")
+st.markdown(
+    "Upload a CSV/XLSX with one client per row. Columns map to the placeholders: "
+    + ", ".join(f"`{c}`" for c in ROSTER_FIELDS)
+    + ". Dates are read day first (`31-Mar-2024` or `31/03/2024`); rows with other dates are"
+    " listed as errors. The valuation image uploaded above is used for every client."
+)
+st.download_button(
+    label="Download Roster Template (CSV)",
+    data=roster_template_csv(),
+    file_name="client_roster_template.csv",
+    mime="text/csv"
+)
+
+roster_file = st.file_uploader("Upload Client Roster", type=["csv", "xlsx"], key="roster_upload")
+bulk_docs = st.multiselect("Documents per client:", list(DOCUMENT_TEMPLATES), default=list(DOCUMENT_TEMPLATES), key="bulk_docs")
+bulk_workers = st.number_input("Worker processes", min_value=1, max_value=job_process_workers(), value=job_process_workers(),
+                               help="Capped at this job's share of the CPUs, since other users' jobs run alongside it.")
+
+if st.button("Generate Bulk Documents", type="primary", disabled=roster_file is None):
+    try:
+        roster = load_roster(roster_file)
     except Exception as e:
-        st.error(f"An error occurred during generation: {str(e)}")
\ No newline at end of file
+        st.error(f"Could not read roster: {e}")
+        st.stop()
+
+    if roster.empty or not bulk_docs:
+        st.error("The roster is empty or no documents are selected.")
+        st.stop()
+
+    submit_job(
+        "bulk_documents", f"Bulk generation for {len(roster)} roster rows", generate_bulk_archive,
+        roster,
+        bulk_docs,
+        template_dir="templates",
+        image_bytes=prepared_image.data if prepared_image is not None else None,
+        max_workers=int(bulk_workers),
+        track_progress=True
+    )
+
+bulk_job = watch_job("bulk_documents")
+if bulk_job is not None:
+    zip_data, generated, errors = bulk_job.result
+    if generated:
+        st.success(f"{bulk_job.label}: {generated} documents generated.")
+    if errors:
+        st.warning(f"{len(errors)} problems (also saved as errors.csv in the ZIP):")
+        st.dataframe(errors, use_container_width=True)
+    if generated:
+        st.download_button(
+            label="Download All (ZIP)",
+            data=zip_data,
+            file_name="bulk_generated_documents.zip",
+            mime="application/zip",
+            key="bulk_download"
+        )
@@ -1,19 +1,200 @@
 import streamlit as st
-import io
 import os
-import pandas as pd
-from utils.valuation_utils import generate_nav_table_image, generate_valuation_report
+from utils.valuation_utils import NAV_SHEET, load_nav_table, generate_valuation_report, nav_image_cache_stats
+from utils.workbooks import open_workbook
+from utils.dcf import (find_dcf_sheet, load_cash_flow_projection, run_dcf, grid_axis, sensitivity_grid,
+                       exit_multiple_grid, dcf_report_tables)
+from utils.monte_carlo import simulation_defaults, simulate_dcf
+from utils.jobs import job_owner, submit_job, watch_job
+from utils.perf import show_perf_panel
 
 st.set_page_config(page_title="Valuations", page_icon="📊", layout="wide")
 
 st.title("Valuations Dashboard")
+show_perf_panel(job_owner())
+
+def show_dcf_analysis(uploaded_dcf):
+    """DCF tab body; returns early (rather than st.stop) so the NAV tab still renders."""
+    if not uploaded_dcf:
+        return
+    dcf_workbook = open_workbook(uploaded_dcf)
+    default_sheet = find_dcf_sheet(dcf_workbook.sheet_names)
+    dcf_sheet = st.selectbox(
+        "Projection sheet", dcf_workbook.sheet_names,
+        index=dcf_workbook.sheet_names.index(default_sheet) if default_sheet else 0,
+    )
+    try:
+        projection = load_cash_flow_projection(dcf_workbook, dcf_sheet)
+    except ValueError as e:
+        st.error(str(e))
+        return
+    with st.expander("Projected cash flows", expanded=True):
+        st.dataframe(projection.to_frame().style.format("{:,.0f}"))
+
+    col_a, col_b, col_c = st.columns(3)
+    with col_a:
+        wacc = st.number_input("WACC (%)", 1.0, 50.0, 12.0, 0.25) / 100
+        growth = st.number_input("Terminal growth (%)", -5.0, 20.0, 4.0, 0.25) / 100
+    with col_b:
+        net_debt = st.number_input("Net debt (cash is negative)", value=0.0, step=1e5, format="%.0f")
+        shares = st.number_input("Shares outstanding (0 = show equity value)", min_value=0.0, value=0.0, step=1e3, format="%.0f")
+    with col_c:
+        mid_year = st.checkbox("Mid-year discounting", value=False)
+        grid_points = st.slider("Grid points per axis", 5, 101, 21, 2)
+
+    with st.expander("Sensitivity ranges"):
+        col_d, col_e = st.columns(2)
+        with col_d:
+            wacc_step = st.number_input("WACC step (%)", 0.05, 5.0, 0.25, 0.05) / 100
+            growth_step = st.number_input("Growth step (%)", 0.05, 5.0, 0.25, 0.05) / 100
+        with col_e:
+            exit_multiple = st.number_input("Exit EV/EBITDA multiple", 1.0, 50.0, 10.0, 0.5)
+            multiple_step = st.number_input("Multiple step", 0.1, 10.0, 0.5, 0.1)
+
+    if wacc <= growth:
+        st.error("WACC must be above the terminal growth rate.")
+        return
+
+    summary = run_dcf(projection, wacc, growth, net_debt, shares or None, mid_year)
+    waccs = grid_axis(wacc, wacc_step, grid_points)
+    growth_grid = sensitivity_grid(projection, waccs, grid_axis(growth, growth_step, grid_points),
+                                   net_debt, shares or None, mid_year)
+    exit_grid = None
+    if projection.ebitda is not None:
+        exit_grid = exit_multiple_grid(projection, waccs, grid_axis(exit_multiple, multiple_step, grid_points),
+                                       net_debt, shares or None, mid_year)
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Enterprise value", f"{summary['Enterprise value']:,.0f}")
+    m2.metric("Equity value", f"{summary['Equity value']:,.0f}")
+    if shares:
+        m3.metric("Value per share", f"{summary['Value per share']:,.2f}")
+    else:
+        m3.metric("Terminal value share of EV", f"{summary['Terminal value share of EV']:.1%}")
+
+    value_label = "value per share" if shares else "equity value"
+    st.subheader(f"WACC x terminal growth ({value_label})")
+    st.dataframe(growth_grid.style.format("{:,.0f}", na_rep="-"))
+    if exit_grid is not None:
+        st.subheader(f"WACC x exit multiple ({value_label})")
+        st.dataframe(exit_grid.style.format("{:,.0f}", na_rep="-"))
+    else:
+        st.caption("Add an 'EBITDA' row to the projections for the exit-multiple grid.")
+
+    simulation = None
+    with st.expander("Monte Carlo simulation"):
+        run_simulation = st.checkbox("Simulate a value distribution (included in the report)", value=False)
+        defaults = simulation_defaults(projection, wacc, growth)
+        g_mean, g_sd = defaults['revenue_growth'][1:]
+        m_mean, m_sd = defaults['fcf_margin'][1:]
+        base_default = projection.revenue[0] / (1 + g_mean) if projection.revenue is not None else projection.fcf[0] / m_mean
+
+        col_f, col_g, col_h = st.columns(3)
+        with col_f:
+            scenarios = st.number_input("Scenarios", 1_000, 2_000_000, 100_000, 10_000)
+            base_revenue = st.number_input("Base (last actual) revenue", value=float(base_default), format="%.0f")
+            fixed_seed = st.checkbox("Fixed seed (reproducible)", value=True)
+            seed = st.number_input("Seed", 0, 2**31 - 1, 42) if fixed_seed else None
+        with col_g:
+            g_mean = st.number_input("Revenue growth mean (%)", value=g_mean * 100, step=0.5) / 100
+            g_sd = st.number_input("Revenue growth std. dev. (%)", 0.0, value=g_sd * 100, step=0.5) / 100
+            m_mean = st.number_input("FCF margin mean (%)", value=m_mean * 100, step=0.5) / 100
+            m_sd = st.number_input("FCF margin std. dev. (%)", 0.0, value=m_sd * 100, step=0.5) / 100
+        with col_h:
+            w_low, w_high = st.slider("WACC range (%), triangular around base", 1.0, 50.0,
+                                      (defaults['wacc'][1] * 100, defaults['wacc'][3] * 100), 0.25)
+            t_low, t_high = st.slider("Terminal growth range (%), uniform", -5.0, 20.0,
+                                      (defaults['terminal_growth'][1] * 100, defaults['terminal_growth'][2] * 100), 0.25)
+
+        if run_simulation:
+            specs = {
+                'revenue_growth': ('normal', g_mean, g_sd),
+                'fcf_margin': ('normal', m_mean, m_sd),
+                'wacc': ('triangular', w_low / 100, min(max(wacc, w_low / 100), w_high / 100), w_high / 100),
+                'terminal_growth': ('uniform', t_low / 100, t_high / 100),
+            }
+            # Only rerun when an input changes, not on every other widget interaction;
+            # the session keeps the latest (inputs, result) pair
+            simulation_key = (float(base_revenue), len(projection.periods), tuple(sorted(specs.items())),
+                              int(scenarios), seed, float(net_debt), shares or None, mid_year)
+            try:
+                cached = st.session_state.get("dcf_simulation")
+                if cached is None or cached[0] != simulation_key:
+                    with st.spinner("Simulating..."):
+                        result = simulate_dcf(base_revenue, len(projection.periods), specs, int(scenarios), seed,
+                                              net_debt, shares or None, mid_year)
+                    st.session_state.dcf_simulation = cached = (simulation_key, result)
+                simulation = cached[1]
+            except Exception as e:
+                st.error(f"Simulation failed: {e}")
+            else:
+                if not len(simulation.values):
+                    st.error("Every scenario had terminal growth at or above WACC.")
+                    simulation = None
+                else:
+                    cols = st.columns(4)
+                    for col, p in zip(cols, (5, 50, 95)):
+                        col.metric(f"P{p}", f"{simulation.percentiles[p]:,.0f}")
+                    cols[3].metric("Mean", f"{simulation.mean:,.0f}")
+                    histogram = simulation.histogram()
+                    st.bar_chart(histogram.assign(Value=histogram['From'].round(0)).set_index('Value')['Scenarios'])
+                    if simulation.invalid:
+                        st.caption(f"{simulation.invalid:,} scenarios with terminal growth >= WACC were left out.")
+
+    # Report: same pipeline as NAV, with the DCF tables written as native Word tables
+    dcf_template_path = os.path.join("templates", "dcf_report_template.docx")
+    with st.form("dcf_form"):
+        st.markdown("**Report Details** (tags: `{{ dcf_summary }}`, `{{ dcf_sensitivity }}`, `{{ dcf_exit_sensitivity }}`)")
+        dcf_company = st.text_input("Target Company Name", "My Client Company Pvt Ltd", key="dcf_company")
+        dcf_date = st.date_input("Valuation Date", key="dcf_date")
+        submit_dcf = st.form_submit_button("Generate DCF Report", type="primary")
+
+    if submit_dcf:
+        if not os.path.exists(dcf_template_path):
+            st.error(f"Template not found at: {dcf_template_path}")
+            return
+        dcf_context = {
+            'valuation_date': dcf_date.strftime("%d-%b-%Y"),
+            'company': dcf_company,
+            'enterprise_value': f"{summary['Enterprise value']:,.0f}",
+            'equity_value': f"{summary['Equity value']:,.0f}",
+        }
+        report_tables = dcf_report_tables(summary, growth_grid, exit_grid)
+        if simulation is not None:
+            report_tables.update(simulation.report_tables())
+        submit_job("dcf_report", f"DCF report for {dcf_company}", render_report,
+                   f"DCF_Report_{dcf_company.replace(' ', '_')}.docx", dcf_template_path, dcf_context,
+                   tables=report_tables)
+
+def render_report(file_name, template_path, context, **kwargs):
+    """Background job body: (download file name, .docx bytes)."""
+    return file_name, generate_valuation_report(template_path, context, **kwargs).getvalue()
+
+def show_report_job(kind, button_label):
+    """Progress of the latest report job of `kind`, then its download (also after a reconnect)."""
+    job = watch_job(kind)
+    if job is None:
+        return
+    file_name, data = job.result
+    st.success("Report Generated Successfully!")
+    st.download_button(
+        label=button_label,
+        data=data,
+        file_name=file_name,
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        key=f"{kind}_download"
+    )
 
 tab1, tab2 = st.tabs(["DCF Analysis", "NAV Calculation"])
 
-# --- DCF TAB (Placeholder) ---
+# --- DCF TAB ---
 with tab1:
     st.header("Discounted Cash Flow (DCF)")
-    st.info("This module is currently under development.")
+    st.markdown("Value the business from **projected free cash flows** in the Excel workings, with WACC / growth sensitivity grids.")
+
+    uploaded_dcf = st.file_uploader("Upload workings with a DCF / cash flow sheet", type=["xlsx", "xls"], key="dcf_excel")
+    show_dcf_analysis(uploaded_dcf)
+    show_report_job("dcf_report", "Download DCF Report (.docx)")
 
 # --- NAV TAB ---
 with tab2:
@@ -34,7 +215,8 @@ with tab2:
             st.success("Excel Loaded!")
             # Optional: Preview the data
             try:
-                preview_df = pd.read_excel(uploaded_excel, sheet_name='NAV Calculation Working')
+                # Parsed once per upload; the report below reuses the same sheet
+                preview_df = open_workbook(uploaded_excel).read_sheet(NAV_SHEET)
                 with st.expander("Preview NAV Data"):
                     st.dataframe(preview_df.head())
             except Exception as e:
@@ -72,36 +254,33 @@ with tab2:
             st.error(f"Template not found at: {template_path}")
             st.stop()
 
-        with st.spinner("Analyzing Excel and generating report..."):
-            try:
-                # A. Generate the Image from Excel
-                # We need to reset the file pointer because we might have read it for preview
-                uploaded_excel.seek(0)
-                nav_image_buffer = generate_nav_table_image(uploaded_excel)
-                
-                # B. Prepare the Context (Map inputs to {{placeholders}})
-                context = {
-                    'valuation_date': valuation_date.strftime("%d-%b-%Y"),
-                    'company': company_name,
-                    'directed_to': directed_to,
-                    'appointing_company': appointing_company,
-                    'appointing_company_address': appointing_address,
-                    'appointing_company_3line_address': appointing_3line,
-                    # 'nav.jpg' is handled inside the utility function
-                }
-
-                # C. Generate the DOCX
-                final_report_io = generate_valuation_report(template_path, context, nav_image_buffer)
-                
-                # D. Success & Download
-                st.success("Report Generated Successfully!")
-                
-                st.download_button(
-                    label="Download NAV Report (.docx)",
-                    data=final_report_io,
-                    file_name=f"NAV_Report_{company_name.replace(' ', '_')}.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
+        try:
+            # A. Load the cleaned NAV table from Excel
+            nav_table = load_nav_table(uploaded_excel)
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
+            st.stop()
 
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+        # B. Prepare the Context (Map inputs to {{placeholders}})
+        context = {
+            'valuation_date': valuation_date.strftime("%d-%b-%Y"),
+            'company': company_name,
+            'directed_to': directed_to,
+            'appointing_company': appointing_company,
+            'appointing_company_address': appointing_address,
+            'appointing_company_3line_address': appointing_3line,
+            # The NAV table ({{ nav_table }}, or the 'nav.jpg' image fallback)
+            # is handled inside the utility function
+        }
+
+        # C. Generate the DOCX as a background job
+        submit_job("nav_report", f"NAV report for {company_name}", render_report,
+                   f"NAV_Report_{company_name.replace(' ', '_')}.docx", template_path, context,
+                   nav_table=nav_table)
+
+    # D. Progress, then Success & Download
+    show_report_job("nav_report", "Download NAV Report (.docx)")
+    image_stats = nav_image_cache_stats()
+    if image_stats["hits"] or image_stats["misses"]:
+        # Only templates without {{ nav_table }} render the table as an image
+        st.caption(f"NAV table image cache: {image_stats['hits']} hits / {image_stats['misses']} misses")
@@ -0,0 +1,35 @@
+import tempfile
+import zipfile
+
+# Archives stay in memory up to this size, then spill to a temp file on disk
+SPOOL_THRESHOLD = 32 * 1024 * 1024
+
+class DocumentArchive:
+    """
+    ZIP archive that generated documents are streamed into as soon as each
+    one is rendered, instead of collecting BytesIO copies first. The archive
+    is backed by a SpooledTemporaryFile, so large batches move to disk
+    rather than inflating the worker's memory.
+    """
+
+    def __init__(self, max_memory=SPOOL_THRESHOLD):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory, suffix=".zip")
+        self.zip = zipfile.ZipFile(self.file, "w", zipfile.ZIP_DEFLATED)
+
+    def add_document(self, name, doc):
+        """Saves a python-docx Document straight into a new archive entry."""
+        with self.zip.open(name, "w", force_zip64=True) as entry:
+            doc.save(entry)
+
+    def add_bytes(self, name, data):
+        self.zip.writestr(name, data)
+
+    def finish(self):
+        """Closes the ZIP and returns the underlying file, rewound for reading."""
+        self.zip.close()
+        self.file.seek(0)
+        return self.file
+
+    def discard(self):
+        self.zip.close()
+        self.file.close()
@@ -2,42 +2,93 @@ import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
+import copy
 import os
+import threading
 
-def load_config():
-    """Loads the YAML config file."""
-    config_path = 'config.yaml'
+CONFIG_PATH = 'config.yaml'
+
+# --- Config cache ---
+
+_config = {}
+_config_lock = threading.Lock()
+
+def _cached_config(config_path):
+    # (mtime/size stamp, parsed config); the stamp doubles as the config version
+    path = os.path.abspath(config_path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _config_lock:
+        entry = _config.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry
+    with open(path) as file:
+        config = yaml.load(file, Loader=SafeLoader)
+    # Hash any plain-text passwords once here instead of checking them on every rerun
+    if (config.get('credentials') or {}).get('usernames'):
+        stauth.Hasher.hash_passwords(config['credentials'])
+    with _config_lock:
+        _config[path] = (stamp, config)
+    return stamp, config
+
+def _require_config_file(config_path):
     if not os.path.exists(config_path):
         st.error("Config file not found. Please create config.yaml.")
         st.stop()
-        
-    with open(config_path) as file:
-        config = yaml.load(file, Loader=SafeLoader)
-    return config
 
-def require_auth():
+def load_config(config_path=CONFIG_PATH):
     """
-    This function should be called at the very top of EVERY page.
-    It handles the login widget and stops execution if not logged in.
+    Loads the YAML config file. It is parsed once per process and
+    re-read only when the file's mtime or size changes.
     """
-    config = load_config()
+    _require_config_file(config_path)
+    return _cached_config(config_path)[1]
 
-    authenticator = stauth.Authenticate(
-        config['credentials'],
+def _build_authenticator(config):
+    # The authenticator edits its credentials (lower-cased usernames, login
+    # flags), so each session gets its own copy of the cached config
+    return stauth.Authenticate(
+        copy.deepcopy(config['credentials']),
         config['cookie']['name'],
         config['cookie']['key'],
         config['cookie']['expiry_days'],
+        auto_hash=False,  # passwords were hashed when the config was loaded
     )
 
-    # Render the login widget
-    # Note: We put this in the sidebar usually, or main body
-    # For a dedicated login page feel, we put it in main, but once logged in, it disappears.
-    
-    try:
-        # Check authentication state
-        authenticator.login()
-    except Exception as e:
-        st.error(e)
+def _still_valid(config):
+    # A user removed from config.yaml is logged out on their next rerun
+    usernames = {name.lower() for name in (config['credentials'].get('usernames') or {})}
+    return str(st.session_state.get("username") or '').lower() in usernames
+
+def require_auth():
+    """
+    This function should be called at the very top of EVERY page.
+    It handles the login widget and stops execution if not logged in.
+    Sessions that are already logged in reuse the authenticator built at
+    login and skip the login path, until config.yaml changes.
+    """
+    _require_config_file(CONFIG_PATH)
+    stamp, config = _cached_config(CONFIG_PATH)
+    session_auth = st.session_state.get("_authenticator")
+
+    if st.session_state.get("authentication_status") and session_auth is not None and session_auth[0] == stamp:
+        authenticator = session_auth[1]
+    else:
+        if st.session_state.get("authentication_status") and not _still_valid(config):
+            st.session_state["authentication_status"] = None
+        # Not logged in (or config changed): full path, including the cookie check
+        authenticator = _build_authenticator(config)
+
+        # Render the login widget
+        # Note: We put this in the sidebar usually, or main body
+        # For a dedicated login page feel, we put it in main, but once logged in, it disappears.
+
+        try:
+            # Check authentication state
+            authenticator.login()
+        except Exception as e:
+            st.error(e)
+        st.session_state["_authenticator"] = (stamp, authenticator)
 
     if st.session_state["authentication_status"]:
         # LOGGED IN SUCCESSFULLY
@@ -45,10 +96,10 @@ def require_auth():
             st.write(f'Welcome *{st.session_state["name"]}*')
             authenticator.logout('Logout', 'main')
         return True # Allow the page to run
-        
+
     elif st.session_state["authentication_status"] is False:
         st.error('Username/password is incorrect')
         st.stop() # Stop the page from running
     elif st.session_state["authentication_status"] is None:
         st.warning('Please enter your username and password')
-        st.stop() # Stop the page from running
\ No newline at end of file
+        st.stop() # Stop the page from running
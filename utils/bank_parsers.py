@@ -1,161 +1,444 @@
-import pdfplumber
-import camelot
 import re
-import pandas as pd
 from datetime import datetime
-import streamlit as st
+from utils.statement_document import StatementDocument, as_statement_document
+from utils.statement_cache import content_key, get_statement_cache
+from utils.transactions import TransactionBatch, normalize_transactions
+from utils.jobs import job_process_pool, job_process_workers
+from utils.perf import collect, merge, span
+from utils.reconciliation import TRANSFER_WINDOW_DAYS, reconcile_transactions
 
 # --- Helper Functions ---
 
-def parse_td_visa_amount(amount_str):
-    """Cleans and converts VISA amount string to a float, handling 'CR'."""
-    if not isinstance(amount_str, str): return 0.0
-    is_credit = 'CR' in amount_str
-    cleaned_str = re.sub(r'[^\d.]', '', amount_str)
-    if not cleaned_str: return 0.0
-    amount = float(cleaned_str)
-    return amount if is_credit else -amount
-
-def get_statement_year(pdf_file_object):
+def get_statement_year(document):
     """Extracts the closing year from the first page of a statement."""
     try:
-        with pdfplumber.open(pdf_file_object) as pdf:
-            pdf_file_object.seek(0)
-            page1_text = pdf.pages[0].extract_text() or ""
-            
-            match = re.search(r'\w+\s+\d{1,2},\s+\d{4}\s+-\s+\w+\s+\d{1,2},\s+(\d{4})', page1_text)
-            if match: return int(match.group(1))
-            
-            match = re.search(r'Statement Period:\s*\w+\s\d{1,2}\s(\d{4})', page1_text)
-            if match: return int(match.group(1))
-            
-            match = re.search(r'\w+\s+\d{1,2},\s+(\d{4})\s+to\s+\w+\s+\d{1,2},\s+\d{4}', page1_text)
-            if match: return int(match.group(1))
-            
+        page1_text = as_statement_document(document).page_text(0)
+
+        match = re.search(r'\w+\s+\d{1,2},\s+\d{4}\s+-\s+\w+\s+\d{1,2},\s+(\d{4})', page1_text)
+        if match: return int(match.group(1))
+
+        match = re.search(r'Statement Period:\s*\w+\s\d{1,2}\s(\d{4})', page1_text)
+        if match: return int(match.group(1))
+
+        match = re.search(r'\w+\s+\d{1,2},\s+(\d{4})\s+to\s+\w+\s+\d{1,2},\s+\d{4}', page1_text)
+        if match: return int(match.group(1))
+
         return datetime.now().year
     except Exception:
         return datetime.now().year
 
 # --- Bank Parsers ---
 
-def parse_bank_of_america(file_object):
-    st.toast(f"Processing Bank of America: {file_object.name}...")
-    transactions = []
-    try:
-        with pdfplumber.open(file_object) as pdf:
-            file_object.seek(0)
-            full_text = "\n".join([page.extract_text() for page in pdf.pages if page.extract_text()])
+BOA_WITHDRAWALS_START = "Withdrawals and other debits"
+BOA_WITHDRAWALS_END = "Total withdrawals and other debits"
+BOA_FEES_START = "Service fees - continued"
+BOA_FEES_END = "Total service fees"
+BOA_WITHDRAWAL_LINE = re.compile(r'^(\d{2}/\d{2}/\d{2})\s+(.*?)\s+(-?[\d,]+\.\d{2})$')
+BOA_FEE_ENTRY = re.compile(r'(\d{2}/\d{2}/\d{2})\s+(.*?)\s+(-?[\d,]+\.\d{2})')
 
-        # Withdrawals
-        try:
-            withdrawals_block = re.search(r'Withdrawals and other debits\n(.*?)\nTotal withdrawals and other debits', full_text, re.DOTALL).group(1)
-            current_transaction = None
-            for line in withdrawals_block.strip().split('\n'):
-                match = re.match(r'^(\d{2}/\d{2}/\d{2})\s+(.*?)\s+(-?[\d,]+\.\d{2})$', line)
-                if match:
-                    if current_transaction:
-                        full_date = datetime.strptime(current_transaction['date'], "%m/%d/%y").strftime("%Y-%m-%d")
-                        amount = float(re.sub(r'[^\d.-]', '', current_transaction['amount']))
-                        desc = ' '.join(current_transaction['desc_parts'])
-                        transactions.append(("Bank of America", full_date, "", desc, amount))
-                    date_str, desc_part, amount_str = match.groups()
-                    current_transaction = {'date': date_str, 'desc_parts': [desc_part.strip()], 'amount': amount_str}
-                elif current_transaction:
-                    current_transaction['desc_parts'].append(line.strip())
-            if current_transaction:
-                full_date = datetime.strptime(current_transaction['date'], "%m/%d/%y").strftime("%Y-%m-%d")
-                amount = float(re.sub(r'[^\d.-]', '', current_transaction['amount']))
-                desc = ' '.join(current_transaction['desc_parts'])
-                transactions.append(("Bank of America", full_date, "", desc, amount))
-        except AttributeError:
-            pass 
-
-        # Fees
-        try:
-            fees_block = re.search(r'Service fees - continued\n(.*?)\nTotal service fees', full_text, re.DOTALL).group(1)
-            matches = re.findall(r'(\d{2}/\d{2}/\d{2})\s+(.*?)\s+(-?[\d,]+\.\d{2})', fees_block)
-            for date_str, desc, amount_str in matches:
-                full_date = datetime.strptime(date_str, "%m/%d/%y").strftime("%Y-%m-%d")
-                amount = float(re.sub(r'[^\d.-]', '', amount_str))
-                if amount != 0:
-                    transactions.append(("Bank of America", full_date, "", ' '.join(desc.split()), amount))
-        except AttributeError:
-            pass
-
-    except Exception as e:
-        st.error(f"Error parsing BoA {file_object.name}: {e}")
+def _boa_row(date_str, desc, amount_str, amount_rule='signed'):
+    # Raw row in RAW_COLUMNS order; converted by normalize_transactions()
+    return ("Bank of America", date_str, "%m/%d/%y", "", desc, amount_str, amount_rule)
+
+def iter_bank_of_america_transactions(document):
+    """
+    Streams Bank of America transactions with a line state machine.
+    Pages are pulled one at a time and never joined, so memory stays flat
+    on very long statements; sections that span pages simply carry their
+    state over to the next page. Withdrawals are yielded as soon as the
+    next entry (or the section total) closes them. The few service fee
+    lines are kept and matched as one block, since a fee's date,
+    description and amount can wrap across lines; fees are yielded at the
+    end, after the withdrawals, as before.
+    """
+    in_withdrawals, withdrawals_done = False, False
+    in_fees = False
+    current = None
+    fee_lines = None
+
+    for page_text in document.stream_page_text():
+        if not page_text:
+            continue
+        for line in page_text.split('\n'):
+            # Withdrawals: multi-line entries, continuation lines extend the description
+            if in_withdrawals:
+                if line.startswith(BOA_WITHDRAWALS_END):
+                    in_withdrawals, withdrawals_done = False, True
+                    if current:
+                        yield _boa_row(current[0], ' '.join(current[1]), current[2])
+                        current = None
+                else:
+                    match = BOA_WITHDRAWAL_LINE.match(line.strip())
+                    if match:
+                        if current:
+                            yield _boa_row(current[0], ' '.join(current[1]), current[2])
+                        date_str, desc_part, amount_str = match.groups()
+                        current = (date_str, [desc_part.strip()], amount_str)
+                    elif current:
+                        current[1].append(line.strip())
+            elif not withdrawals_done and line.endswith(BOA_WITHDRAWALS_START):
+                in_withdrawals = True
+
+            # Service fees
+            if in_fees:
+                if line.startswith(BOA_FEES_END):
+                    in_fees = False
+                else:
+                    fee_lines.append(line)
+            elif fee_lines is None and line.endswith(BOA_FEES_START):
+                in_fees, fee_lines = True, []
+
+    # A section without its closing total runs to the end of the statement
+    if current:
+        yield _boa_row(current[0], ' '.join(current[1]), current[2])
+    # \s+ in the entry pattern spans line breaks, as in the joined statement text
+    for date_str, desc, amount_str in BOA_FEE_ENTRY.findall('\n'.join(fee_lines or [])):
+        # Zero (waived) fees are dropped during normalization
+        yield _boa_row(date_str, ' '.join(desc.split()), amount_str, 'signed_nonzero')
+
+def parse_bank_of_america(document):
+    document = as_statement_document(document)
+    transactions = TransactionBatch()
+    for txn in iter_bank_of_america_transactions(document):
+        transactions.add(*txn)
     return transactions
 
-def parse_td_visa_card(file_object):
-    st.toast(f"Processing TD VISA: {file_object.name}...")
-    transactions = []
-    year = get_statement_year(file_object)
-    try:
-        tables = camelot.read_pdf(file_object, pages='3', flavor='stream')
-        if not tables: return []
-        df = tables[0].df.replace(r'^\s*$', float('nan'), regex=True)
-        
-        header_row = -1
-        for i, row in df.iterrows():
-             row_text = ' '.join(str(s) for s in row if pd.notna(s))
-             if 'Activity Date' in row_text and 'Reference Number' in row_text:
-                 header_row = i
-                 break
-        if header_row == -1: return []
-
-        for i in range(header_row + 1, len(df)):
-            row = df.iloc[i]
-            if pd.notna(row[1]) and pd.notna(row.iloc[-1]):
-                full_date_str = f"{row[1].strip()} {year}"
-                try:
-                    date_obj = datetime.strptime(full_date_str, "%b %d %Y").strftime("%Y-%m-%d")
-                    amount = parse_td_visa_amount(row.iloc[-1])
-                    ref = row[2]
-                    desc = ' '.join(str(s) for s in row[3:-1] if pd.notna(s))
-                    transactions.append(('TD BUSINESS SOLUTIONS VISA', date_obj, ref, desc, amount))
-                except:
-                    continue
-    except Exception as e:
-        st.error(f"Error parsing TD VISA {file_object.name}: {e}")
+VISA_HEADER_PHRASES = ("Activity Date", "Reference Number")
+VISA_ACTIVITY_DATE = re.compile(r'^[A-Z][a-z]{2}\s+\d{1,2}$')
+VISA_AMOUNT_TOKEN = re.compile(r'^-?\$?[\d,]*\.\d{2}$|^CR$')
+
+def _group_word_lines(words, y_tolerance=3):
+    """Groups pdfplumber words into visual lines (top to bottom, left to right)."""
+    lines = []
+    for w in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and abs(w['top'] - lines[-1][0]) <= y_tolerance:
+            lines[-1][1].append(w)
+        else:
+            lines.append((w['top'], [w]))
+    return [sorted(line_words, key=lambda w: w['x0']) for _, line_words in lines]
+
+def _visa_column_anchors(header_words):
+    """Left edges of the activity table columns, taken from the header line."""
+    anchors = {}
+    for i, w in enumerate(header_words):
+        text = w['text']
+        if text == 'Activity' and 'activity' not in anchors:
+            anchors['activity'] = w['x0']
+        elif text == 'Reference' and 'ref' not in anchors:
+            anchors['ref'] = w['x0']
+            # Without a Description header, descriptions start after "Number"
+            if i + 1 < len(header_words):
+                anchors.setdefault('desc', header_words[i + 1]['x1'] + 1)
+        elif text.startswith('Description'):
+            anchors['desc'] = w['x0']
+        elif text.startswith('Amount'):
+            anchors['amount'] = w['x0']
+    return anchors
+
+def _split_visa_line(line_words, anchors, tolerance=2):
+    cells = {'posting': [], 'activity': [], 'ref': [], 'desc': [], 'amount': []}
+    trailing = []
+    if 'amount' not in anchors:
+        # No Amount header: take the trailing amount tokens ("1,234.56", "CR")
+        while line_words and VISA_AMOUNT_TOKEN.match(line_words[-1]['text']) and len(trailing) < 2:
+            trailing.insert(0, line_words[-1])
+            line_words = line_words[:-1]
+    for w in line_words:
+        if 'amount' in anchors and w['x1'] >= anchors['amount'] - tolerance:
+            column = 'amount'
+        elif w['x0'] >= anchors['desc'] - tolerance:
+            column = 'desc'
+        elif w['x0'] >= anchors['ref'] - tolerance:
+            column = 'ref'
+        elif w['x0'] >= anchors['activity'] - tolerance:
+            column = 'activity'
+        else:
+            column = 'posting'
+        cells[column].append(w['text'])
+    cells['amount'].extend(w['text'] for w in trailing)
+    return {k: ' '.join(v) for k, v in cells.items()}
+
+def extract_visa_activity_rows(document):
+    """
+    Finds the "Activity Date / Reference Number" table on every page using
+    pdfplumber word coordinates and returns (activity date, reference,
+    description, amount) string tuples for rows that have a date and amount.
+    """
+    rows = []
+    for index in range(document.page_count):
+        lines = _group_word_lines(document.page_words(index))
+        header_at = None
+        for i, line_words in enumerate(lines):
+            line_text = ' '.join(w['text'] for w in line_words)
+            if all(phrase in line_text for phrase in VISA_HEADER_PHRASES):
+                header_at = i
+                break
+        if header_at is None:
+            continue
+
+        anchors = _visa_column_anchors(lines[header_at])
+        if not {'activity', 'ref', 'desc'} <= anchors.keys():
+            continue
+        for line_words in lines[header_at + 1:]:
+            cells = _split_visa_line(line_words, anchors)
+            if VISA_ACTIVITY_DATE.match(cells['activity']) and cells['amount']:
+                rows.append((cells['activity'], cells['ref'], cells['desc'], cells['amount']))
+    return rows
+
+def parse_td_visa_card(document):
+    document = as_statement_document(document)
+    transactions = TransactionBatch()
+    year = get_statement_year(document)
+    # Rows with unparseable dates or amounts are dropped during normalization
+    for activity_date, ref, desc, amount in extract_visa_activity_rows(document):
+        transactions.add('TD BUSINESS SOLUTIONS VISA', f"{activity_date} {year}", "%b %d %Y",
+                         ref, desc, amount, 'cr_suffix')
     return transactions
 
-def parse_td_generic(file_object, bank_name, credit_headers, debit_headers):
-    st.toast(f"Processing {bank_name}: {file_object.name}...")
-    transactions = []
-    year = get_statement_year(file_object)
+def parse_td_generic(document, bank_name, credit_headers, debit_headers):
+    document = as_statement_document(document)
+    transactions = TransactionBatch()
+    year = get_statement_year(document)
     all_headers = credit_headers + debit_headers
+    text = document.page_text(0, x_tolerance=2, y_tolerance=3)
+
+    in_section, current_type = False, None
+
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line: continue
+
+        matched = False
+        for h in all_headers:
+            if line.startswith(h):
+                in_section, current_type, matched = True, 'credit' if h in credit_headers else 'debit', True
+                break
+        if matched: continue
+
+        if line.startswith("Subtotal:"):
+            in_section = False
+            continue
+        if in_section and "POSTING DATE" in line: continue
+
+        if in_section:
+            match = re.match(r'^(\d{2}/\d{2})\s+(.*?)\s+([\d,]+\.\d{2})$', line)
+            if match:
+                d_str, desc, amt_str = match.groups()
+                transactions.add(bank_name, f"{d_str}/{year}", "%m/%d/%Y", '', desc.strip(), amt_str, current_type)
+    return transactions
+
+# --- Parser Registry ---
+
+PARSER_REGISTRY = {}
+
+def register_parser(cls):
+    """
+    Class decorator that makes a StatementParser subclass available for
+    auto-detection and in the bank selector, keyed by its name.
+    """
+    PARSER_REGISTRY[cls.name] = cls()
+    return cls
+
+class StatementParser:
+    """
+    Base class for bank statement parsers.
+    `fingerprints` are phrases that must all appear in the first page text;
+    they are checked before the (expensive) full parse runs.
+    Bump `version` whenever the parser's output changes so cached rows
+    produced by the old logic are no longer served.
+    """
+    name = None
+    version = 1
+    fingerprints = ()
+
+    def matches(self, first_page_text):
+        text = first_page_text.upper()
+        return bool(self.fingerprints) and all(f.upper() in text for f in self.fingerprints)
+
+    def parse(self, document):
+        raise NotImplementedError
+
+@register_parser
+class BankOfAmericaParser(StatementParser):
+    name = "Bank of America"
+    version = 2
+    fingerprints = ("Bank of America",)
+
+    def parse(self, document):
+        return parse_bank_of_america(document)
+
+@register_parser
+class TDVisaParser(StatementParser):
+    name = "TD BUSINESS SOLUTIONS VISA"
+    version = 3
+    fingerprints = ("TD BUSINESS SOLUTIONS VISA",)
+
+    def parse(self, document):
+        return parse_td_visa_card(document)
+
+class TDGenericParser(StatementParser):
+    """TD deposit accounts that share one layout but differ in section headers."""
+    version = 2
+    credit_headers = ()
+    debit_headers = ()
+
+    def parse(self, document):
+        return parse_td_generic(document, self.name, list(self.credit_headers), list(self.debit_headers))
+
+@register_parser
+class TDBusinessConvenienceParser(TDGenericParser):
+    name = "TD Business Convenience Plus"
+    fingerprints = ("TD Business Convenience Plus",)
+    credit_headers = ("Electronic Deposits",)
+    debit_headers = ("Electronic Payments",)
+
+@register_parser
+class TDPremiumMoneyMarketParser(TDGenericParser):
+    name = "TD Small Business Premium Money Mar"
+    fingerprints = ("TD Small Business Premium Money Mar",)
+    credit_headers = ("Other Credits",)
+    debit_headers = ("Electronic Payments", "Other Withdrawals")
+
+def get_parser(bank_type):
     try:
-        with pdfplumber.open(file_object) as pdf:
-            file_object.seek(0)
-            page = pdf.pages[0]
-            text = page.extract_text(x_tolerance=2, y_tolerance=3) or ""
-
-            in_section, current_type = False, None
-
-            for line in text.split('\n'):
-                line = line.strip()
-                if not line: continue
-
-                matched = False
-                for h in all_headers:
-                    if line.startswith(h):
-                        in_section, current_type, matched = True, 'credit' if h in credit_headers else 'debit', True
-                        break
-                if matched: continue
-
-                if line.startswith("Subtotal:"):
-                    in_section = False
-                    continue
-                if in_section and "POSTING DATE" in line: continue
-
-                if in_section:
-                    match = re.match(r'^(\d{2}/\d{2})\s+(.*?)\s+([\d,]+\.\d{2})$', line)
-                    if match:
-                        d_str, desc, amt_str = match.groups()
-                        full_date = datetime.strptime(f"{d_str}/{year}", "%m/%d/%Y").strftime("%Y-%m-%d")
-                        amt = float(re.sub(r'[^\d.]', '', amt_str))
-                        if current_type == 'debit': amt = -amt
-                        transactions.append((bank_name, full_date, '', desc.strip(), amt))
-    except Exception as e:
-        st.error(f"Error parsing {bank_name} ({file_object.name}): {e}")
-    return transactions
\ No newline at end of file
+        return PARSER_REGISTRY[bank_type]
+    except KeyError:
+        raise ValueError(f"Unsupported bank type: {bank_type}")
+
+def detect_parser(document):
+    """Returns the registered parser whose fingerprint matches page 1, or None."""
+    document = as_statement_document(document)
+    try:
+        first_page_text = document.page_text(0)
+    except Exception:
+        return None
+    for parser in PARSER_REGISTRY.values():
+        if parser.matches(first_page_text):
+            return parser
+    return None
+
+def detect_bank_type(file_object):
+    """Cheap bank detection for an upload; returns the bank name or None."""
+    with as_statement_document(file_object) as document:
+        parser = detect_parser(document)
+    return parser.name if parser else None
+
+# --- Dispatch ---
+
+def parse_statement(file_object, bank_type=None, use_cache=True):
+    """
+    Runs the parser registered for the bank type, auto-detecting it from
+    the first page when bank_type is None.
+    The PDF is opened once here and shared by the year detector and parser.
+    Results are looked up in / stored to the on-disk statement cache.
+    Returns a raw TransactionBatch; see utils.transactions for normalization.
+    """
+    parser = get_parser(bank_type) if bank_type is not None else None
+    with as_statement_document(file_object) as document:
+        if parser is None:
+            with span("detect"):
+                parser = detect_parser(document)
+            if parser is None:
+                raise ValueError(f"Could not detect the bank for {document.name}")
+
+        cache, key = None, None
+        if use_cache:
+            with span("cache_lookup", bytes=len(document.data)) as s:
+                cache = get_statement_cache()
+                key = content_key(document.data, parser.name, parser.version)
+                cached = cache.get(key)
+                if cached is not None:
+                    s["rows"] = len(cached)
+            if cached is not None:
+                return TransactionBatch.from_rows(cached)
+
+        # Includes the pdf_text / pdf_words spans taken while parsing; the rest is matching
+        with span(f"parse:{parser.name}") as s:
+            transactions = parser.parse(document)
+            s["pages"], s["rows"] = document.page_count, len(transactions)
+    if cache is not None:
+        cache.put(key, transactions.rows())
+    return transactions
+
+# --- Parallel Parsing ---
+
+def _parse_statement_job(job, use_cache=True):
+    """
+    Process pool entry point. Takes a picklable (name, pdf bytes, bank type)
+    tuple (bank type may be None to auto-detect) and returns
+    (name, transactions, error message or None, timing spans).
+    """
+    name, data, bank_type = job
+    with collect() as spans:
+        try:
+            result = name, parse_statement(StatementDocument(name, data), bank_type, use_cache), None
+        except Exception as e:
+            result = name, TransactionBatch(), str(e) or type(e).__name__
+    return result + (spans,)
+
+def _collect_result(result):
+    # Timings recorded in the worker join the caller's perf run
+    merge(result[3])
+    return result[:3]
+
+def parse_statements_parallel(jobs, max_workers=None, use_cache=True, progress=None):
+    """
+    Parses (name, pdf bytes, bank type) jobs in a process pool.
+    Results come back in the same order as the jobs, so the consolidated
+    output does not depend on which worker finishes first. A failing file
+    is reported in its result tuple instead of aborting the batch.
+    `progress(done, total)` is called as results are collected.
+    By default the pool gets this job's share of the CPUs (see
+    utils.jobs.job_process_workers).
+    """
+    if not jobs:
+        return []
+    if max_workers is None:
+        max_workers = job_process_workers()
+    max_workers = max(1, min(max_workers, len(jobs)))
+
+    results = []
+    if max_workers == 1:
+        for job in jobs:
+            results.append(_collect_result(_parse_statement_job(job, use_cache)))
+            if progress:
+                progress(len(results), len(jobs))
+        return results
+
+    with job_process_pool(max_workers) as executor:
+        futures = [executor.submit(_parse_statement_job, job, use_cache) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(_collect_result(future.result()))
+            except Exception as e:
+                # The worker process itself died (e.g. killed by the OS)
+                results.append((job[0], TransactionBatch(), str(e) or type(e).__name__))
+            if progress:
+                progress(len(results), len(jobs))
+    return results
+
+def consolidate_statements(jobs, max_workers=None, use_cache=True, progress=None,
+                           transfer_window=TRANSFER_WINDOW_DAYS):
+    """
+    Parses every (name, pdf bytes, bank type) job, normalizes the combined
+    rows (with a Source column naming each row's file) and reconciles them:
+    duplicates from overlapping statements are flagged and transfers
+    between the accounts matched (see utils.reconciliation).
+    Returns (transactions DataFrame, [(name, error)]).
+    This is what the Operations page runs as a background job.
+    """
+    batch = TransactionBatch()
+    sources = []
+    errors = []
+    for name, txns, error in parse_statements_parallel(jobs, max_workers, use_cache, progress):
+        if error:
+            errors.append((name, error))
+        batch.extend(txns)
+        sources.extend([name] * len(txns))
+    with span("normalize", rows=len(batch)):
+        raw = batch.to_frame()
+        raw['Source'] = sources
+        df = normalize_transactions(raw)
+    with span("reconcile", rows=len(df)):
+        df = reconcile_transactions(df, transfer_window)
+    return df, errors
@@ -0,0 +1,207 @@
+import io
+import os
+import re
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from utils.archives import DocumentArchive
+from utils.doc_utils import (DOCUMENT_TEMPLATES, build_base_context, document_context, process_word_template,
+                             save_document)
+from utils.jobs import job_process_pool, job_process_workers
+from utils.perf import collect, merge, span
+
+# Roster column -> build_base_context argument. Columns may also be written
+# as placeholders ("<<company>>") and are matched case-insensitively.
+ROSTER_FIELDS = {
+    "company": "company",
+    "valuation_type_statement": "valuation_statement",
+    "authority": "authority",
+    "designation": "designation",
+    "addressed_to": "addressed_to",
+    "group_designation": "group_designation",
+    "address1": "address1",
+    "address2": "address2",
+    "address3": "address3",
+    "valuation_date": "valuation_date",
+    "br_date": "br_date",
+    "engagement_date": "engagement_date",
+}
+
+def roster_template_csv():
+    """Empty roster with the expected header, for users to fill in."""
+    return (",".join(ROSTER_FIELDS) + "\n").encode()
+
+def _normalize_column(name):
+    return str(name).strip().strip('<>').strip().lower()
+
+def load_roster(file_object):
+    """Reads a CSV/XLSX roster and checks that every roster column is present."""
+    name = getattr(file_object, 'name', '').lower()
+    if name.endswith(('.xlsx', '.xls')):
+        roster = pd.read_excel(file_object, dtype=object)
+    else:
+        roster = pd.read_csv(file_object, dtype=str, keep_default_na=False)
+    roster.columns = [_normalize_column(c) for c in roster.columns]
+    missing = [c for c in ROSTER_FIELDS if c not in roster.columns]
+    if missing:
+        raise ValueError(f"Roster is missing columns: {', '.join(missing)}")
+    return roster
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return value if hasattr(value, 'strftime') else str(value).strip()
+
+def build_roster_jobs(roster, selected_docs, template_dir="templates"):
+    """
+    Turns roster rows into (row, company, doc name, template path, context)
+    render jobs. Rows that cannot be mapped (empty company, bad date) become
+    error records instead, so one bad row does not sink the batch.
+    Row numbers match the spreadsheet (header is row 1).
+    """
+    jobs, errors = [], []
+    for row_number, record in enumerate(roster.to_dict('records'), start=2):
+        company = _cell(record.get("company"))
+        try:
+            if not company:
+                raise ValueError("company is empty")
+            base_context = build_base_context(**{arg: _cell(record.get(col)) for col, arg in ROSTER_FIELDS.items()})
+        except Exception as e:
+            errors.append({"row": row_number, "company": company, "document": "", "error": str(e)})
+            continue
+        for doc_name in selected_docs:
+            template_path = os.path.join(template_dir, DOCUMENT_TEMPLATES[doc_name])
+            jobs.append((row_number, company, doc_name, template_path, document_context(base_context, doc_name)))
+    return jobs, errors
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+def generate_documents(base_context, selected_docs, template_dir="templates", image_bytes=None):
+    """
+    Renders the selected documents for one client. A single document is
+    returned as-is; several are streamed into a ZIP as each one is
+    rendered. Returns (file name, bytes, mime, documents generated,
+    missing template names), or a None file name if nothing was generated.
+    """
+    archive = DocumentArchive() if len(selected_docs) > 1 else None
+    generated, missing = [], []
+    single = None
+    try:
+        for doc_name in selected_docs:
+            filename = DOCUMENT_TEMPLATES[doc_name]
+            file_path = os.path.join(template_dir, filename)
+            if not os.path.exists(file_path):
+                missing.append(filename)
+                continue
+            image_stream = io.BytesIO(image_bytes) if image_bytes is not None else None
+            doc = process_word_template(file_path, document_context(base_context, doc_name),
+                                        provided_image_stream=image_stream)
+            if archive is not None:
+                with span("docx_save"):
+                    archive.add_document(f"Generated_{filename}", doc)
+            else:
+                single = save_document(doc)
+            generated.append(f"Generated_{filename}")
+    except Exception:
+        if archive is not None:
+            archive.discard()
+        raise
+
+    if not generated:
+        if archive is not None:
+            archive.discard()
+        return None, None, None, 0, missing
+    if archive is None:
+        return generated[0], single, DOCX_MIME, 1, missing
+    # Streamlit needs the bytes; this is the only full copy in memory
+    return "generated_documents.zip", archive.finish().read(), "application/zip", len(generated), missing
+
+def archive_name(row_number, company, doc_name):
+    # Row number keeps clients with the same name apart
+    safe_company = re.sub(r'[^\w.\- ]+', '_', company).strip() or "client"
+    return f"{row_number:04d}_{safe_company}/Generated_{DOCUMENT_TEMPLATES[doc_name]}"
+
+# --- Worker side ---
+
+_worker_image = None
+
+def _init_worker(image_bytes):
+    # The image is sent once per worker process instead of once per job
+    global _worker_image
+    _worker_image = image_bytes
+
+def _render_job(job):
+    # Returns the result tuple plus the timing spans recorded in the worker
+    row_number, company, doc_name, template_path, context = job
+    with collect() as spans:
+        try:
+            image_stream = io.BytesIO(_worker_image) if _worker_image is not None else None
+            doc = process_word_template(template_path, context, provided_image_stream=image_stream)
+            result = row_number, company, doc_name, save_document(doc), None
+        except Exception as e:
+            result = row_number, company, doc_name, None, str(e)
+    return result + (spans,)
+
+def _collect_result(result):
+    merge(result[5])
+    return result[:5]
+
+def _iter_rendered(jobs, image_bytes, max_workers):
+    if max_workers == 1:
+        _init_worker(image_bytes)
+        for job in jobs:
+            yield _collect_result(_render_job(job))
+        return
+    with job_process_pool(max_workers, initializer=_init_worker, initargs=(image_bytes,)) as executor:
+        futures = {executor.submit(_render_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield _collect_result(future.result())
+            except Exception as e:
+                # The worker process itself died
+                row_number, company, doc_name = futures[future][:3]
+                yield row_number, company, doc_name, None, str(e)
+
+def generate_bulk_documents(roster, selected_docs, template_dir="templates", image_bytes=None,
+                            max_workers=None, progress=None):
+    """
+    Renders every roster row x selected document in parallel worker processes
+    (by default this job's share of the CPUs) and streams the results into one ZIP (one folder per client) as they
+    finish. `progress(done, total)` is called after each document.
+    Returns (ZIP file object, number of documents generated, error records);
+    the error records are also written to errors.csv inside the archive.
+    """
+    jobs, errors = build_roster_jobs(roster, selected_docs, template_dir)
+    if max_workers is None:
+        max_workers = job_process_workers()
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+
+    generated = 0
+    archive = DocumentArchive()
+    try:
+        for done, (row_number, company, doc_name, data, error) in enumerate(_iter_rendered(jobs, image_bytes, max_workers), 1):
+            if error:
+                errors.append({"row": row_number, "company": company, "document": doc_name, "error": error})
+            else:
+                archive.add_bytes(archive_name(row_number, company, doc_name), data)
+                generated += 1
+            if progress:
+                progress(done, len(jobs))
+        if errors:
+            errors.sort(key=lambda e: (e["row"], e["document"]))
+            archive.add_bytes("errors.csv", pd.DataFrame(errors).to_csv(index=False))
+    except Exception:
+        archive.discard()
+        raise
+    return archive.finish(), generated, errors
+
+def generate_bulk_archive(roster, selected_docs, template_dir="templates", image_bytes=None,
+                          max_workers=None, progress=None):
+    """generate_bulk_documents with the ZIP read into bytes, for a background job's result."""
+    zip_file, generated, errors = generate_bulk_documents(roster, selected_docs, template_dir, image_bytes,
+                                                          max_workers, progress)
+    try:
+        return zip_file.read(), generated, errors
+    finally:
+        zip_file.close()
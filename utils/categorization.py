@@ -0,0 +1,219 @@
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import yaml
+from yaml.loader import SafeLoader
+
+from utils.perf import span
+
+RULES_PATH = 'category_rules.yaml'
+DEFAULT_CATEGORY = 'Uncategorized'
+# Rows are matched against the amount ranges this many at a time (rows x rules booleans)
+CHUNK_SIZE = 50_000
+RULE_KEYS = {'category', 'keywords', 'regex', 'min_amount', 'max_amount'}
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def _normalize_keyword(keyword):
+    return ' '.join(str(keyword).upper().split())
+
+def _trie_pattern(keywords):
+    # One regex for every keyword, with shared prefixes factored out, so
+    # the engine branches per character instead of trying each keyword.
+    # A longer keyword is preferred over its prefix at the same position.
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [(r'\s+' if ch == ' ' else re.escape(ch)) + build(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+    return build(trie)
+
+class CategoryRules:
+    """
+    A rule file compiled into one matcher. Each rule assigns `category`
+    when its text condition (any of its keywords, as whole words, or its
+    regex; case-insensitive) and its amount range (min_amount/max_amount,
+    inclusive, on the signed amount) both hold. A rule needs at least one
+    condition; the first matching rule in file order wins.
+    """
+
+    def __init__(self, rules, default=DEFAULT_CATEGORY):
+        self.default = default
+        self.categories = []
+        self.mins, self.maxs = [], []
+        self.text_free = []          # rules with only an amount range
+        keyword_rules = {}           # normalized keyword -> rule numbers
+        regex_rules = {}             # pattern -> rule numbers
+        for number, rule in enumerate(rules or []):
+            label = f"Rule {number + 1}"
+            if not isinstance(rule, dict) or not rule.get('category'):
+                raise ValueError(f"{label} needs a 'category'.")
+            label = f"{label} ({rule['category']})"
+            unknown = set(rule) - RULE_KEYS
+            if unknown:
+                raise ValueError(f"{label}: unknown field(s) {', '.join(sorted(unknown))}.")
+            keywords = [k for k in (_normalize_keyword(k) for k in _as_list(rule.get('keywords'))) if k]
+            patterns = _as_list(rule.get('regex'))
+            low, high = rule.get('min_amount'), rule.get('max_amount')
+            if not keywords and not patterns and low is None and high is None:
+                raise ValueError(f"{label} has no keywords, regex or amount range.")
+            for pattern in patterns:
+                try:
+                    re.compile(pattern, re.IGNORECASE)
+                except (re.error, TypeError) as e:
+                    raise ValueError(f"{label}: invalid regex '{pattern}': {e}")
+                regex_rules.setdefault(pattern, []).append(number)
+            for keyword in keywords:
+                keyword_rules.setdefault(keyword, set()).add(number)
+
+            self.categories.append(str(rule['category']))
+            self.mins.append(-np.inf if low is None else float(low))
+            self.maxs.append(np.inf if high is None else float(high))
+            if not keywords and not patterns:
+                self.text_free.append(number)
+
+        # A keyword that matched also implies the keywords that are its
+        # whole-word prefixes (they matched at the same spot but were not reported)
+        self.keyword_rules = {}
+        for keyword, numbers in keyword_rules.items():
+            implied = set(numbers)
+            for other, other_numbers in keyword_rules.items():
+                if len(other) < len(keyword) and keyword.startswith(other) and not (
+                        keyword[len(other)].isalnum() or keyword[len(other)] == '_'):
+                    implied |= other_numbers
+            self.keyword_rules[keyword] = sorted(implied)
+
+        self.keyword_matcher = None
+        if keyword_rules:
+            # Lookahead at every word start, so overlapping keywords are all found
+            self.keyword_matcher = re.compile(r'(?<!\w)(?=(' + _trie_pattern(keyword_rules) + r')(?!\w))')
+        # Plain regexes are joined into one alternation that finds the
+        # descriptions matching any of them in one search; only those are
+        # checked pattern by pattern. A regex with groups or inline flags
+        # would change meaning in the join (a backreference points at
+        # another rule's group, named groups clash, flags apply to all),
+        # so those are always searched on their own.
+        self.regexes, self.separate_regexes = [], []
+        for pattern, numbers in regex_rules.items():
+            regex = re.compile(pattern, re.IGNORECASE)
+            plain = regex.groups == 0 and re.compile(pattern).flags == re.compile('').flags
+            (self.regexes if plain else self.separate_regexes).append((regex, numbers))
+        self.regex_matcher = None
+        if self.regexes:
+            try:
+                self.regex_matcher = re.compile('|'.join(f'(?:{r.pattern})' for r, _ in self.regexes), re.IGNORECASE)
+            except re.error as e:
+                raise ValueError(f"Could not combine the rule regexes: {e}")
+        # The default is a last catch-all rule: no text condition, any amount
+        self.text_free.append(len(self.categories))
+        self.mins = np.array(self.mins + [-np.inf])
+        self.maxs = np.array(self.maxs + [np.inf])
+        self.categories = np.array(self.categories + [default], dtype=object)
+
+    def __len__(self):
+        return len(self.categories) - 1
+
+    def text_matches(self, descriptions):
+        """Boolean (descriptions x rules + default) matrix of text conditions that hold."""
+        # (row, rule) hits are gathered in plain lists and set in one assignment
+        rows, numbers = [], []
+        if self.keyword_matcher is not None:
+            lookup = self.keyword_rules
+            findall = self.keyword_matcher.findall
+            for row, text in enumerate(descriptions):
+                for keyword in findall(text):
+                    # Matched text may have runs of whitespace; keywords are stored single-spaced
+                    rules = lookup.get(keyword) or lookup[' '.join(keyword.split())]
+                    rows.extend([row] * len(rules))
+                    numbers.extend(rules)
+        if self.regex_matcher is not None:
+            search = self.regex_matcher.search
+            for row, text in enumerate(descriptions):
+                if search(text):
+                    for regex, rules in self.regexes:
+                        if regex.search(text):
+                            rows.extend([row] * len(rules))
+                            numbers.extend(rules)
+        for regex, rules in self.separate_regexes:
+            search = regex.search
+            for row, text in enumerate(descriptions):
+                if search(text):
+                    rows.extend([row] * len(rules))
+                    numbers.extend(rules)
+        matched = np.zeros((len(descriptions), len(self.categories)), dtype=bool)
+        matched[:, self.text_free] = True
+        matched[rows, numbers] = True
+        return matched
+
+    def categorize(self, descriptions, amounts):
+        """
+        Category per row. Each distinct description is run through the
+        matcher once; the amount ranges are then applied to all rows at
+        once, in chunks of CHUNK_SIZE rows.
+        """
+        codes, unique = pd.factorize(pd.Series(descriptions).fillna('').astype(str))
+        text = self.text_matches(pd.Series(unique, dtype=object).str.upper().tolist())
+        amounts = np.asarray(amounts, dtype=float)
+        first = np.empty(len(codes), dtype=np.int64)
+        for start in range(0, len(codes), CHUNK_SIZE):
+            stop = start + CHUNK_SIZE
+            amount = amounts[start:stop, None]
+            hits = text[codes[start:stop]] & (amount >= self.mins) & (amount <= self.maxs)
+            first[start:stop] = hits.argmax(axis=1)
+        return self.categories[first]
+
+def compile_rules(spec):
+    """CategoryRules from a parsed rule file: {'default': ..., 'rules': [...]}."""
+    spec = spec or {}
+    return CategoryRules(spec.get('rules'), spec.get('default') or DEFAULT_CATEGORY)
+
+# --- Rule file cache ---
+
+_rules = {}
+_rules_lock = threading.Lock()
+
+def load_rules(path=RULES_PATH):
+    """
+    Returns (stamp, CategoryRules) for a YAML rule file. The file is
+    compiled once and re-read only when its mtime or size changes; the
+    stamp identifies the version, e.g. for caching categorized results.
+    Raises ValueError for an invalid rule file.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _rules_lock:
+        entry = _rules.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry
+    with open(path) as file:
+        try:
+            spec = yaml.load(file, Loader=SafeLoader)
+        except yaml.YAMLError as e:
+            raise ValueError(f"Could not read {os.path.basename(path)}: {e}")
+    compiled = compile_rules(spec)
+    with _rules_lock:
+        _rules[path] = (stamp, compiled)
+    return stamp, compiled
+
+def categorize_transactions(df, rules):
+    """A copy of the consolidated frame with a 'Category' column from `rules`."""
+    df = df.copy()
+    with span("categorize", rows=len(df)):
+        df['Category'] = rules.categorize(df['Description'], df['Amount'])
+    return df
@@ -0,0 +1,195 @@
+import numpy as np
+import pandas as pd
+
+from utils.valuation_utils import clean_currency
+from utils.workbooks import open_workbook
+
+# Sheets searched (in order) for projections when none is chosen
+DCF_SHEET_KEYWORDS = ('DCF', 'CASH FLOW', 'PROJECTION', 'FINANCIALS')
+FCF_LABELS = ('free cash flow', 'free cash flow to firm', 'fcff', 'fcf')
+EBITDA_LABELS = ('ebitda',)
+REVENUE_LABELS = ('revenue', 'revenues', 'total revenue', 'net sales', 'sales')
+# Sensitivity tables in the Word report are cut to this many rows/columns around the base case
+REPORT_GRID_SIZE = 7
+
+class CashFlowProjection:
+    """Projected free cash flows (and revenue / EBITDA, when the sheet has them) per period."""
+
+    def __init__(self, periods, fcf, ebitda=None, sheet=None, revenue=None):
+        self.periods = list(periods)
+        self.fcf = np.asarray(fcf, dtype=float)
+        self.ebitda = None if ebitda is None else np.asarray(ebitda, dtype=float)
+        self.revenue = None if revenue is None else np.asarray(revenue, dtype=float)
+        self.sheet = sheet
+
+    def to_frame(self):
+        rows = {}
+        if self.revenue is not None:
+            rows['Revenue'] = self.revenue
+        if self.ebitda is not None:
+            rows['EBITDA'] = self.ebitda
+        rows['Free Cash Flow'] = self.fcf
+        return pd.DataFrame(rows, index=self.periods).T
+
+# --- Loading projections ---
+
+def find_dcf_sheet(sheet_names):
+    for keyword in DCF_SHEET_KEYWORDS:
+        for name in sheet_names:
+            if keyword in name.upper():
+                return name
+    return None
+
+def _find_row(df, labels):
+    names = df.iloc[:, 0].astype(str).str.strip().str.lower()
+    for label in labels:
+        matches = names.index[names == label]
+        if len(matches):
+            return df.loc[matches[0]]
+    return None
+
+def load_cash_flow_projection(excel_file, sheet_name=None):
+    """
+    Reads projected cash flows from a workbook sheet laid out as a label
+    column followed by one column per period (header row = period names).
+    The 'Free Cash Flow' row is required; an 'EBITDA' row enables
+    exit-multiple valuations, a 'Revenue' row simulation defaults.
+    Non-numeric period columns are skipped.
+    """
+    workbook = open_workbook(excel_file)
+    sheet_name = sheet_name or find_dcf_sheet(workbook.sheet_names)
+    if sheet_name is None:
+        raise ValueError("No DCF / cash flow sheet found in the workbook.")
+    df = workbook.read_sheet(sheet_name)
+
+    fcf_row = _find_row(df, FCF_LABELS)
+    if fcf_row is None:
+        raise ValueError(f"Sheet '{sheet_name}' has no 'Free Cash Flow' row.")
+    fcf = pd.to_numeric(fcf_row.iloc[1:].map(clean_currency), errors='coerce')
+    periods = fcf.index[fcf.notna()]
+    if not len(periods):
+        raise ValueError(f"The 'Free Cash Flow' row in '{sheet_name}' has no numeric values.")
+
+    def optional_row(labels):
+        row = _find_row(df, labels)
+        if row is None:
+            return None
+        values = pd.to_numeric(row.iloc[1:].map(clean_currency), errors='coerce')[periods]
+        return values.to_numpy() if values.notna().all() else None
+
+    return CashFlowProjection([str(p) for p in periods], fcf[periods].to_numpy(), optional_row(EBITDA_LABELS),
+                              sheet_name, optional_row(REVENUE_LABELS))
+
+# --- Engine ---
+# Every function broadcasts: `wacc`, `growth` and `multiple` may be scalars or
+# arrays of any (mutually broadcastable) shape, and `fcf` may carry the same
+# leading batch dimensions as them, with periods on the last axis.
+
+def _explicit_pv(fcf, wacc, mid_year):
+    fcf = np.asarray(fcf, dtype=float)
+    wacc = np.asarray(wacc, dtype=float)
+    t = np.arange(1, fcf.shape[-1] + 1) - (0.5 if mid_year else 0.0)
+    discount = (1.0 + wacc[..., None]) ** -t
+    return (fcf * discount).sum(axis=-1), discount
+
+def dcf_enterprise_value(fcf, wacc, growth, mid_year=False):
+    """
+    Enterprise value with a Gordon-growth terminal value on the final
+    period's cash flow. Returns (enterprise value, PV of terminal value);
+    both are NaN wherever growth >= WACC.
+    """
+    pv_explicit, discount = _explicit_pv(fcf, wacc, mid_year)
+    wacc = np.asarray(wacc, dtype=float)
+    growth = np.asarray(growth, dtype=float)
+    last_fcf = np.asarray(fcf, dtype=float)[..., -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terminal = np.where(wacc > growth, last_fcf * (1.0 + growth) / (wacc - growth), np.nan)
+    pv_terminal = terminal * discount[..., -1]
+    return pv_explicit + pv_terminal, pv_terminal
+
+def dcf_exit_value(fcf, final_ebitda, wacc, multiple, mid_year=False):
+    """Enterprise value with an EV/EBITDA exit multiple, realised at the end of the final period."""
+    pv_explicit, _ = _explicit_pv(fcf, wacc, mid_year)
+    wacc = np.asarray(wacc, dtype=float)
+    n = np.asarray(fcf).shape[-1]
+    pv_terminal = np.asarray(final_ebitda, dtype=float) * np.asarray(multiple, dtype=float) * (1.0 + wacc) ** -n
+    return pv_explicit + pv_terminal, pv_terminal
+
+def equity_value(enterprise_value, net_debt=0.0, shares=None):
+    """Equity value, or value per share when a share count is given."""
+    equity = enterprise_value - net_debt
+    return equity / shares if shares else equity
+
+# --- Summary and sensitivity grids ---
+
+def grid_axis(center, step, count):
+    """`count` evenly spaced points centred on `center` (count is rounded up to odd)."""
+    half = int(count) // 2
+    return center + step * np.arange(-half, half + 1)
+
+def run_dcf(projection, wacc, growth, net_debt=0.0, shares=None, mid_year=False):
+    """Base-case valuation as a dict of headline figures."""
+    ev, pv_terminal = dcf_enterprise_value(projection.fcf, wacc, growth, mid_year)
+    ev, pv_terminal = float(ev), float(pv_terminal)
+    summary = {
+        'WACC': wacc,
+        'Terminal growth': growth,
+        'PV of explicit cash flows': ev - pv_terminal,
+        'PV of terminal value': pv_terminal,
+        'Terminal value share of EV': pv_terminal / ev if ev else np.nan,
+        'Enterprise value': ev,
+        'Net debt': net_debt,
+        'Equity value': ev - net_debt,
+    }
+    if shares:
+        summary['Value per share'] = (ev - net_debt) / shares
+    return summary
+
+def _grid_frame(values, rows, columns, row_name, column_format):
+    frame = pd.DataFrame(values, index=[f"{w:.2%}" for w in rows], columns=[column_format(c) for c in columns])
+    frame.index.name = row_name
+    return frame
+
+def sensitivity_grid(projection, waccs, growths, net_debt=0.0, shares=None, mid_year=False):
+    """
+    Equity value (or value per share) for every WACC x terminal growth
+    pair, computed in one broadcast pass. Rows are WACC, columns growth.
+    """
+    waccs = np.asarray(waccs, dtype=float)
+    ev, _ = dcf_enterprise_value(projection.fcf, waccs[:, None], np.asarray(growths, dtype=float)[None, :], mid_year)
+    return _grid_frame(equity_value(ev, net_debt, shares), waccs, growths, 'WACC \\ g', lambda g: f"{g:.2%}")
+
+def exit_multiple_grid(projection, waccs, multiples, net_debt=0.0, shares=None, mid_year=False):
+    """Equity value (or per share) for every WACC x EV/EBITDA exit multiple pair."""
+    if projection.ebitda is None:
+        raise ValueError("Exit-multiple valuation needs an 'EBITDA' row in the projections.")
+    waccs = np.asarray(waccs, dtype=float)
+    ev, _ = dcf_exit_value(projection.fcf, projection.ebitda[-1], waccs[:, None],
+                           np.asarray(multiples, dtype=float)[None, :], mid_year)
+    return _grid_frame(equity_value(ev, net_debt, shares), waccs, multiples, 'WACC \\ multiple', lambda m: f"{m:.1f}x")
+
+def _centre(grid, size):
+    r0 = max(0, (grid.shape[0] - size) // 2)
+    c0 = max(0, (grid.shape[1] - size) // 2)
+    return grid.iloc[r0:r0 + size, c0:c0 + size]
+
+def _summary_frame(summary):
+    rates = {'WACC', 'Terminal growth', 'Terminal value share of EV'}
+    return pd.DataFrame({
+        'Particulars': list(summary),
+        'Value': [f"{v:.2%}" if k in rates else v for k, v in summary.items()],
+    })
+
+def dcf_report_tables(summary, growth_grid, exit_grid=None, size=REPORT_GRID_SIZE):
+    """
+    Native Word tables for generate_valuation_report, keyed by template tag:
+    {{ dcf_summary }}, {{ dcf_sensitivity }} and {{ dcf_exit_sensitivity }}.
+    Grids are cut to `size` x `size` around the base case to fit the page.
+    """
+    tables = {
+        'dcf_summary': _summary_frame(summary),
+        'dcf_sensitivity': _centre(growth_grid, size).round(0).reset_index(),
+    }
+    if exit_grid is not None:
+        tables['dcf_exit_sensitivity'] = _centre(exit_grid, size).round(0).reset_index()
+    return tables
@@ -1,49 +1,103 @@
-from docx import Document
-from docx.shared import Inches, Pt
+from datetime import datetime
+from docx.shared import Inches
 import pandas as pd
 import io
-import matplotlib.pyplot as plt
-from pandas.plotting import table
+from utils.docx_templates import get_compiled_template
+from utils.perf import span
+from utils.workbooks import open_workbook
 
-def process_word_template(template_path, context, table_data=None, provided_image_stream=None):
+# Selectable documents -> template file in templates/
+DOCUMENT_TEMPLATES = {
+    "Board Resolution": "Board Resolution.docx",
+    "Engagement Letter": "Engagement Letter.docx",
+    "Management Rep Letter": "Management-representation-letter.docx"
+}
+
+DOC_DATE_FORMAT = "%d-%b-%Y"
+# Text dates accepted from rosters. Numeric dates are day first, as the firm
+# writes them (03/04/2024 is 3 April); anything else is rejected, not guessed.
+DATE_INPUT_FORMATS = ("%d-%b-%Y", "%d %b %Y", "%d-%B-%Y", "%d %B %Y", "%Y-%m-%d", "%Y-%m-%d %H:%M:%S",
+                      "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+
+def format_doc_date(value, field="date"):
     """
-    Opens a Word template, replaces placeholders.
-    Inserts a table image from 'provided_image_stream' (Direct user upload).
+    Formats a date as 31-Mar-2024. Text is parsed with DATE_INPUT_FORMATS
+    only; raises ValueError naming `field` if it matches none of them.
     """
-    doc = Document(template_path)
-    
-    # 1. Iterate through all paragraphs
-    paragraphs = list(doc.paragraphs)
-    
-    for p in paragraphs:
-        # --- Table Image Insertion Logic ---
-        # Look for the placeholder <<valuation.jpg>>
-        if '<<valuation.jpg>>' in p.text and provided_image_stream is not None:
-            p.text = "" # Clear the placeholder text
-            run = p.add_run()
-            
-            # Reset stream pointer to ensure we read from start if reused
-            provided_image_stream.seek(0)
-            
-            # Add picture with a set width (6 inches fits standard margins)
-            run.add_picture(provided_image_stream, width=Inches(6.0))
+    if hasattr(value, 'strftime') and not pd.isna(value):
+        return value.strftime(DOC_DATE_FORMAT)
+    text = str(value).strip() if value is not None and not pd.isna(value) else ""
+    if not text:
+        raise ValueError(f"{field} is empty")
+    for date_format in DATE_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime(DOC_DATE_FORMAT)
+        except ValueError:
             continue
+    raise ValueError(f"{field} '{text}' is not a date like 31-Mar-2024 or 31/03/2024")
 
-        # --- Standard Text Replacement ---
-        for key, value in context.items():
-            if key in p.text:
-                p.text = p.text.replace(key, str(value))
+def build_base_context(company, valuation_statement, authority, designation, addressed_to,
+                       group_designation, address1, address2, address3,
+                       valuation_date, br_date, engagement_date):
+    """Maps the client details to the <<placeholders>> shared by all templates."""
+    full_address = f"{address1}, {address2}, {address3}"
+    return {
+        "<<company>>": company,
+        "<<company_caps>>": company.upper(),
+        "<<valuation_type_statement>>": valuation_statement,
+        "<<authority>>": authority,
+        "<<designation>>": designation,
+        "<<addressed_to>>": addressed_to,
+        "<<address_caps>>": full_address.upper(),
+        "<<address>>": full_address,
+        "<<address1>>": address1,
+        "<<address2>>": address2,
+        "<<address3>>": address3,
+        "<<group_designation>>": group_designation,
+        "<<authority_designation>>": designation,
+        "<<valuation_date>>": format_doc_date(valuation_date, "valuation_date"),
+        "<<br_date>>": format_doc_date(br_date, "br_date"),
+        "<<engagement_date>>": format_doc_date(engagement_date, "engagement_date"),
+    }
 
-    # 2. Iterate through existing tables to replace text inside them
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                     for key, value in context.items():
-                        if key in p.text:
-                            p.text = p.text.replace(key, str(value))
-    
-    return doc
+def document_context(base_context, doc_name):
+    """Adds the document-specific <<date>> to a copy of the base context."""
+    current_context = base_context.copy()
+    if doc_name == "Management Rep Letter":
+        current_context["<<date>>"] = base_context["<<valuation_date>>"]
+    elif doc_name == "Board Resolution":
+        current_context["<<date>>"] = base_context["<<br_date>>"]
+    elif doc_name == "Engagement Letter":
+        current_context["<<date>>"] = base_context["<<engagement_date>>"]
+        current_context["<<date >>"] = base_context["<<engagement_date>>"]
+    else:
+        current_context["<<date>>"] = base_context["<<valuation_date>>"]
+    return current_context
+
+def process_word_template(template_path, context, table_data=None, provided_image_stream=None):
+    """
+    Renders a Word template, replacing <<placeholders>> in place.
+    Inserts a table image from 'provided_image_stream' (Direct user upload)
+    at the <<valuation.jpg>> placeholder. A 'table_data' DataFrame is written
+    as a native Word table at <<valuation_table>> (or at <<valuation.jpg>>
+    when no image is given).
+    The template is compiled once and cached until the file changes on disk,
+    so only the runs holding placeholders are touched and formatting is kept.
+    """
+    with span("template_load"):
+        compiled = get_compiled_template(template_path)
+    with span("template_render", rows=0 if table_data is None else len(table_data)):
+        # 6 inches fits standard margins
+        return compiled.render(context, image_stream=provided_image_stream, image_width=Inches(6.0),
+                               table_data=table_data)
+
+def save_document(doc):
+    """Serializes a rendered python-docx Document to .docx bytes."""
+    with span("docx_save") as s:
+        doc_io = io.BytesIO()
+        doc.save(doc_io)
+        s["bytes"] = doc_io.tell()
+    return doc_io.getvalue()
 
 # --- Legacy Helper Functions (Preserved but not active in simplified UI) ---
 
@@ -56,16 +110,17 @@ def clean_and_trim_df(df):
 
 def extract_valuation_table_data(excel_file):
     try:
-        xls = pd.ExcelFile(excel_file)
-        sheet_names = xls.sheet_names
+        # Sheet names come from the workbook index; only the chosen sheet is parsed
+        workbook = open_workbook(excel_file)
+        sheet_names = workbook.sheet_names
         target_df = None
         dcf_sheets = [s for s in sheet_names if 'DCF' in s.upper()]
         if dcf_sheets and 'Financials' in sheet_names:
-            target_df = pd.read_excel(xls, 'Financials', header=None)
+            target_df = workbook.read_sheet('Financials', header=None)
         if target_df is None:
             nav_sheets = [s for s in sheet_names if 'NAV' in s.upper()]
             if nav_sheets:
-                target_df = pd.read_excel(xls, nav_sheets[0], header=None)
+                target_df = workbook.read_sheet(nav_sheets[0], header=None)
         if target_df is not None:
             return clean_and_trim_df(target_df)
         return None
@@ -74,10 +129,16 @@ def extract_valuation_table_data(excel_file):
         return None
 
 def generate_financial_table_image(df):
+    # matplotlib is only needed here, so it is imported on first use. No
+    # pyplot: its current figure is shared by every thread in the process.
+    from matplotlib.figure import Figure
+    from pandas.plotting import table
+
     df = df.fillna('')
     w = max(len(df.columns) * 2.0, 8) 
     h = max((len(df) + 1) * 0.4, 3)
-    fig, ax = plt.subplots(figsize=(w, h))
+    fig = Figure(figsize=(w, h))
+    ax = fig.subplots()
     ax.axis('off')
     tbl = table(ax, df, loc='center', cellLoc='center', colWidths=[1.0/len(df.columns)] * len(df.columns))
     tbl.auto_set_font_size(False)
@@ -99,7 +160,8 @@ def generate_financial_table_image(df):
             cell.set_linewidth(0.5)
             cell.visible_edges = "B"
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', dpi=300, pad_inches=0.1)
+    with span("table_image_save") as s:
+        fig.savefig(buf, format='png', bbox_inches='tight', dpi=300, pad_inches=0.1)
+        s["bytes"] = buf.tell()
     buf.seek(0)
-    plt.close(fig)
     return buf
\ No newline at end of file
@@ -0,0 +1,133 @@
+import io
+import os
+import re
+import threading
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches
+from docx.text.paragraph import Paragraph
+
+from utils.word_tables import add_dataframe_table, replace_paragraph_with_table
+
+PLACEHOLDER = re.compile(r'<<[^<>]*>>')
+IMAGE_PLACEHOLDER = '<<valuation.jpg>>'
+TABLE_PLACEHOLDER = '<<valuation_table>>'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+W_P, W_T, W_R, W_PPR = qn('w:p'), qn('w:t'), qn('w:r'), qn('w:pPr')
+
+def _own_text_nodes(p):
+    """<w:t> nodes of a paragraph, excluding those of paragraphs nested in text boxes."""
+    return [t for t in p.iter(W_T) if next(t.iterancestors(W_P)) is p]
+
+def _locate(offsets, pos):
+    """Maps a character position in the joined paragraph text to (node index, offset)."""
+    for i in range(len(offsets) - 1):
+        if pos < offsets[i + 1]:
+            return i, pos - offsets[i]
+    return len(offsets) - 2, pos - offsets[-2]
+
+class CompiledTemplate:
+    """
+    A .docx template parsed once, with an index of every <<placeholder>>
+    occurrence: paragraph number (in body order, including table cells) and
+    the text nodes / offsets where it starts and ends, so placeholders split
+    across runs are found too. Rendering reloads the stored bytes and only
+    edits the indexed text nodes; run formatting is left untouched.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.index = {}             # paragraph number -> [(start node, start offset, end node, end offset, placeholder)]
+        self.image_paragraphs = set()
+        self.table_paragraphs = set()
+        doc = Document(io.BytesIO(data))
+        for p_num, p in enumerate(doc.element.body.iter(W_P)):
+            texts = [t.text or '' for t in _own_text_nodes(p)]
+            full = ''.join(texts)
+            if '<<' not in full:
+                continue
+            offsets = [0]
+            for text in texts:
+                offsets.append(offsets[-1] + len(text))
+            occurrences = []
+            for match in PLACEHOLDER.finditer(full):
+                start_node, start_off = _locate(offsets, match.start())
+                end_node, end_off = _locate(offsets, match.end() - 1)
+                occurrences.append((start_node, start_off, end_node, end_off + 1, match.group()))
+                if match.group() == IMAGE_PLACEHOLDER:
+                    self.image_paragraphs.add(p_num)
+                elif match.group() == TABLE_PLACEHOLDER:
+                    self.table_paragraphs.add(p_num)
+            if occurrences:
+                self.index[p_num] = occurrences
+
+    @property
+    def placeholders(self):
+        return sorted({occ[4] for occs in self.index.values() for occ in occs})
+
+    def render(self, context, image_stream=None, image_width=Inches(6.0), table_data=None):
+        doc = Document(io.BytesIO(self.data))
+        if not self.index:
+            return doc
+        paragraphs = list(doc.element.body.iter(W_P))
+
+        for p_num, occurrences in self.index.items():
+            p = paragraphs[p_num]
+
+            # A DataFrame goes in as a native Word table at <<valuation_table>>,
+            # or at the image placeholder when no image was supplied
+            if table_data is not None and (p_num in self.table_paragraphs or
+                                           (image_stream is None and p_num in self.image_paragraphs)):
+                replace_paragraph_with_table(p, add_dataframe_table(doc, table_data))
+                continue
+
+            # The image placeholder replaces its whole paragraph with the picture
+            if image_stream is not None and p_num in self.image_paragraphs:
+                for child in list(p):
+                    if child.tag != W_PPR:
+                        p.remove(child)
+                image_stream.seek(0)
+                Paragraph(p, doc._body).add_run().add_picture(image_stream, width=image_width)
+                continue
+
+            nodes = _own_text_nodes(p)
+            # Right to left, so earlier offsets stay valid after each edit
+            for start_node, start_off, end_node, end_off, key in reversed(occurrences):
+                if key not in context:
+                    continue
+                value = str(context[key])
+                first, last = nodes[start_node], nodes[end_node]
+                if start_node == end_node:
+                    first.text = first.text[:start_off] + value + first.text[end_off:]
+                else:
+                    tail = last.text[end_off:]
+                    first.text = first.text[:start_off] + value
+                    for node in nodes[start_node + 1:end_node]:
+                        node.text = ''
+                    last.text = tail
+                first.set(XML_SPACE, 'preserve')
+        return doc
+
+# --- Compiled template cache ---
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+def get_compiled_template(path):
+    """
+    Returns the compiled template for a .docx path, compiling it on first use.
+    The entry is rebuilt when the file's mtime or size changes on disk.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _compiled_lock:
+        entry = _compiled.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+    with open(path, 'rb') as f:
+        compiled = CompiledTemplate(f.read())
+    with _compiled_lock:
+        _compiled[path] = (stamp, compiled)
+    return compiled
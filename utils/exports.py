@@ -0,0 +1,68 @@
+import io
+import pandas as pd
+from utils.perf import span
+
+# Label shown in the UI -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV (.csv)": ("csv", "text/csv"),
+    "Parquet (.parquet)": ("parquet", "application/vnd.apache.parquet"),
+}
+
+DATE_FORMAT = 'YYYY-MM-DD'
+# Rows converted to Python values at a time while writing the xlsx
+XLSX_CHUNK_ROWS = 10_000
+
+def _xlsx_values(chunk, date_cols):
+    # Boxed Python values, NaN/NaT/NA -> None, datetimes as datetime objects
+    values = chunk.astype(object).where(chunk.notna(), None)
+    for i in date_cols:
+        col = chunk.iloc[:, i]
+        # list(): pandas 3 returns a Series with a fresh 0-based index here
+        dates = pd.Series(list(col.dt.to_pydatetime()), index=chunk.index, dtype=object)
+        values.isetitem(i, dates.where(col.notna(), None))
+    return values
+
+def write_xlsx_streaming(df, out, sheet_name="Sheet1"):
+    """
+    Writes a DataFrame with openpyxl's write-only workbook, which streams rows
+    to the file instead of building the whole sheet in memory. Rows are
+    converted to Python values XLSX_CHUNK_ROWS at a time, so the boxed copy
+    never holds more than one chunk.
+    Datetime columns are written as real Excel dates.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+
+    date_cols = [i for i, c in enumerate(df.columns) if pd.api.types.is_datetime64_any_dtype(df.iloc[:, i])]
+    for start in range(0, len(df), XLSX_CHUNK_ROWS):
+        values = _xlsx_values(df.iloc[start:start + XLSX_CHUNK_ROWS], date_cols)
+        for row in values.itertuples(index=False, name=None):
+            if date_cols:
+                row = list(row)
+                for i in date_cols:
+                    if row[i] is not None:
+                        cell = WriteOnlyCell(ws, value=row[i])
+                        cell.number_format = DATE_FORMAT
+                        row[i] = cell
+            ws.append(row)
+    wb.save(out)
+
+def export_transactions(df, fmt):
+    """Serializes the consolidated transactions to bytes in the given format."""
+    if fmt not in ("xlsx", "csv", "parquet"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    buffer = io.BytesIO()
+    with span(f"export:{fmt}", rows=len(df)) as s:
+        if fmt == "xlsx":
+            write_xlsx_streaming(df, buffer)
+        elif fmt == "csv":
+            df.to_csv(buffer, index=False, date_format='%Y-%m-%d')
+        else:
+            df.to_parquet(buffer, index=False)
+        s["bytes"] = buffer.tell()
+    return buffer.getvalue()
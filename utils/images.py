@@ -0,0 +1,91 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+# Images are placed 6 inches wide; 300 DPI is plenty for print
+DISPLAY_WIDTH_IN = 6.0
+PRINT_DPI = 300
+PREPARED_CACHE_SIZE = 8
+
+class PreparedImage:
+    """An image downscaled and recompressed for embedding, with its content hash."""
+
+    def __init__(self, data, sha256, width, height, original_size):
+        self.data = data
+        self.sha256 = sha256
+        self.width = width
+        self.height = height
+        self.original_size = original_size
+
+    def stream(self):
+        return io.BytesIO(self.data)
+
+def _prepare(data, width_in, dpi):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        src_format = img.format
+        # 16-bit and float greyscale (I;16/I/F) would clip to black and white
+        # in convert(); scale the 16-bit range down to 8-bit L instead
+        if img.mode in ("I;16", "I;16B", "I;16L", "I", "F"):
+            img = img.convert("I").point(lambda v: v / 256).convert("L")
+        max_width = int(round(width_in * dpi))
+        # Never upscale; only shrink images wider than the printed width needs
+        resized = img.width > max_width
+        if resized:
+            # Pillow resizes palette and 1-bit images with NEAREST whatever
+            # filter is asked for, which leaves logos and charts jagged
+            if img.mode == "P":
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+            elif img.mode == "1":
+                img = img.convert("L")
+            height = max(1, int(round(img.height * max_width / img.width)))
+            img = img.resize((max_width, height), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if src_format == "JPEG":
+            img.convert("RGB").save(out, format="JPEG", quality=88, optimize=True, dpi=(dpi, dpi))
+        else:
+            # Screenshots of tables: keep PNG so text stays sharp
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                img = img.convert("RGBA")
+            img.save(out, format="PNG", optimize=True, dpi=(dpi, dpi))
+        width, height = img.size
+
+    prepared = out.getvalue()
+    # Recompressing a small, already optimized upload can make it bigger
+    if not resized and len(prepared) >= len(data):
+        prepared = data
+    return PreparedImage(prepared, hashlib.sha256(prepared).hexdigest(), width, height, len(data))
+
+_prepared = OrderedDict()
+_prepared_lock = threading.Lock()
+
+def prepare_image(data, width_in=DISPLAY_WIDTH_IN, dpi=PRINT_DPI):
+    """
+    Downscales an uploaded image to the printed width at print DPI and
+    recompresses it, once. Results are memoized by the SHA-256 of the
+    upload, so every document in a run and later reruns with the same
+    upload reuse the prepared bytes.
+    Raises ValueError for a corrupt or unsupported image.
+    """
+    key = (hashlib.sha256(data).hexdigest(), width_in, dpi)
+    with _prepared_lock:
+        if key in _prepared:
+            _prepared.move_to_end(key)
+            return _prepared[key]
+    from PIL import Image, UnidentifiedImageError
+    try:
+        prepared = _prepare(data, width_in, dpi)
+    except UnidentifiedImageError:
+        raise ValueError("not a readable PNG or JPEG image.")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # Truncated files are OSErrors; broken PNG chunks raise SyntaxError
+        raise ValueError(f"the image is damaged ({e}).")
+    with _prepared_lock:
+        _prepared[key] = prepared
+        while len(_prepared) > PREPARED_CACHE_SIZE:
+            _prepared.popitem(last=False)
+    return prepared
@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import streamlit as st
+
+from utils.perf import perf_run, profile_requested
+
+# Jobs running at once across the whole server process
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+# Queued + running jobs allowed per user, so one big upload cannot starve the
+# rest. Kept below JOB_WORKERS by default, so one user never holds every worker.
+MAX_ACTIVE_JOBS_PER_USER = int(os.environ.get("JOB_MAX_PER_USER", str(max(1, JOB_WORKERS - 1))))
+# Finished jobs no session has picked up yet are kept this long (and at most
+# this many per user), so a browser that reconnects still finds them
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", "3600"))
+FINISHED_JOBS_PER_USER = 10
+POLL_INTERVAL = 1.0
+
+# --- Worker processes ---
+
+def job_process_workers():
+    """Worker processes one job's pool gets by default: its share of the CPUs among JOB_WORKERS jobs."""
+    return max(1, (os.cpu_count() or 1) // JOB_WORKERS)
+
+def job_process_pool(max_workers, **kwargs):
+    """
+    ProcessPoolExecutor for work inside a job. Workers are started from a
+    fork server (or spawned where there is none), never forked from the
+    server process itself: it is multithreaded, and a fork copies any lock
+    another thread holds at that moment.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method), **kwargs)
+
+# --- Job queue ---
+
+class JobLimitError(RuntimeError):
+    pass
+
+class Job:
+    """One submitted unit of work, its progress and (once finished) its result or error."""
+
+    def __init__(self, owner, kind, label):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.kind = kind
+        self.label = label
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.perf = None    # PerfRun with the job's stage timings
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def report_progress(self, done, total):
+        self.done, self.total = done, total
+
+class JobQueue:
+    """
+    Process-wide executor shared by every session. Pages submit work and
+    get a job ID back; the job runs on a bounded thread pool while the page
+    keeps rerunning, and its result stays available (by owner) after the
+    browser reconnects, until a session takes it (see take()).
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_active_per_user=MAX_ACTIVE_JOBS_PER_USER):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_active_per_user = max_active_per_user
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, owner, kind, label, fn, *args, track_progress=False, profile=None, **kwargs):
+        """
+        Queues fn(*args, **kwargs) and returns the job ID. With
+        track_progress, fn also gets progress=job.report_progress.
+        The job is timed as a perf run named after its kind; `profile`
+        also captures a cProfile dump (see utils.perf.perf_run).
+        Raises JobLimitError when the owner already has too many jobs queued or running.
+        """
+        job = Job(owner, kind, label)
+        if track_progress:
+            kwargs["progress"] = job.report_progress
+        with self.lock:
+            self._prune()
+            active = sum(1 for j in self.jobs.values() if j.owner == owner and j.active)
+            if active >= self.max_active_per_user:
+                raise JobLimitError(
+                    f"You already have {active} jobs queued or running; wait for one to finish."
+                )
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, fn, args, kwargs, profile)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs, profile=None):
+        job.status, job.started = "running", time.time()
+        try:
+            with perf_run(job.kind, job.owner, profile) as run:
+                job.perf = run
+                job.result = fn(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        job.finished = time.time()
+
+    def get(self, job_id, owner=None):
+        """The job, or None if it is unknown, expired or belongs to another owner."""
+        with self.lock:
+            self._prune()
+            job = self.jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def jobs_for(self, owner, kind=None):
+        """The owner's jobs, newest first."""
+        with self.lock:
+            self._prune()
+            jobs = [j for j in self.jobs.values() if j.owner == owner and (kind is None or j.kind == kind)]
+        return sorted(jobs, key=lambda j: j.submitted, reverse=True)
+
+    def latest(self, owner, kind):
+        jobs = self.jobs_for(owner, kind)
+        return jobs[0] if jobs else None
+
+    def take(self, job_id):
+        """
+        Removes a finished job from the queue, with the owner's older
+        finished jobs of the same kind (only the latest is ever shown), and
+        returns it. From then on the result lives only as long as the
+        caller keeps the job.
+        """
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+            if job is not None:
+                for other in list(self.jobs.values()):
+                    if (other.owner == job.owner and other.kind == job.kind and not other.active
+                            and other.submitted < job.submitted):
+                        del self.jobs[other.id]
+        return job
+
+    def _prune(self):
+        # Called with the lock held
+        now = time.time()
+        finished = {}
+        for job in sorted(self.jobs.values(), key=lambda j: j.submitted, reverse=True):
+            if job.active:
+                continue
+            finished.setdefault(job.owner, []).append(job)
+        for jobs in finished.values():
+            for i, job in enumerate(jobs):
+                if i >= FINISHED_JOBS_PER_USER or now - job.finished > JOB_RESULT_TTL:
+                    del self.jobs[job.id]
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
+
+# --- Page helpers ---
+
+def job_owner():
+    """
+    The logged-in username. Pages without a login fall back to an ID kept
+    in the URL, so a reconnecting tab still finds its jobs.
+    """
+    if st.session_state.get("username"):
+        return st.session_state["username"]
+    if "owner" not in st.query_params:
+        st.query_params["owner"] = uuid.uuid4().hex[:12]
+    return f"guest:{st.query_params['owner']}"
+
+def submit_job(kind, label, fn, *args, **kwargs):
+    """
+    Submits for the current user; shows the limit error and returns None if refused.
+    The job is profiled when the user opted in from the performance panel.
+    """
+    kwargs.setdefault("profile", profile_requested() or None)
+    try:
+        return get_job_queue().submit(job_owner(), kind, label, fn, *args, **kwargs)
+    except JobLimitError as e:
+        st.error(str(e))
+        return None
+
+def watch_job(kind):
+    """
+    Shows the current user's latest job of `kind`: a progress bar that
+    refreshes itself while it is queued or running (without blocking the
+    rest of the page), or the error if it failed. Returns the job once it
+    has finished successfully, else None. The page reruns once when the
+    job finishes so it can show the result.
+    A finished job is moved from the shared queue into this session's
+    state, so its result (e.g. a whole ZIP) is freed with the session or
+    the next job of the kind rather than held for JOB_RESULT_TTL.
+    """
+    queue = get_job_queue()
+    owner = job_owner()
+    key = f"_job_{kind}"
+    kept = st.session_state.get(key)
+    if kept is not None and kept.owner != owner:
+        kept = None
+    job = queue.latest(owner, kind)
+    if job is None or (kept is not None and job.submitted <= kept.submitted):
+        return kept
+    if job.active:
+        @st.fragment(run_every=POLL_INTERVAL)
+        def _progress():
+            current = queue.get(job.id, owner)
+            if current is None or not current.active:
+                st.rerun()
+            elif current.status == "queued":
+                st.progress(0.0, text=f"{current.label}: waiting for a free worker...")
+            else:
+                text = f"{current.label}: {current.done} of {current.total}" if current.total else f"{current.label}: running..."
+                st.progress(current.fraction, text=text)
+        _progress()
+        return None
+    st.session_state.pop(key, None)
+    if job.status == "failed":
+        st.error(f"{job.label} failed: {job.error}")
+        return None
+    st.session_state[key] = queue.take(job.id) or job
+    return st.session_state[key]
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from utils.dcf import dcf_enterprise_value, equity_value
+
+# Scenarios are drawn and valued this many at a time, so memory stays
+# bounded (chunk x years floats per array) however many are requested
+CHUNK_SIZE = 50_000
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+HISTOGRAM_BINS = 50
+# The Word report gets a coarser histogram than the page chart
+REPORT_HISTOGRAM_BINS = 10
+
+# Distribution specs are tuples:
+#   ('fixed', value) | ('normal', mean, sd) | ('uniform', low, high) | ('triangular', low, mode, high)
+DISTRIBUTIONS = ('fixed', 'normal', 'uniform', 'triangular')
+
+def sample(rng, spec, size):
+    kind, *params = spec
+    if kind == 'fixed':
+        return np.full(size, float(params[0]))
+    if kind == 'normal':
+        return rng.normal(params[0], params[1], size)
+    if kind == 'uniform':
+        return rng.uniform(params[0], params[1], size)
+    if kind == 'triangular':
+        if params[0] == params[2]:
+            # A zero-width range (e.g. a slider dragged to one value); numpy rejects it
+            return np.full(size, float(params[0]))
+        return rng.triangular(params[0], params[1], params[2], size)
+    raise ValueError(f"Unknown distribution '{kind}'; expected one of {', '.join(DISTRIBUTIONS)}")
+
+def simulation_defaults(projection, wacc, growth):
+    """
+    Distribution specs centred on a projection: revenue growth and FCF
+    margin from its Revenue/Free Cash Flow rows, WACC and terminal growth
+    around the base case.
+    """
+    if projection.revenue is not None and len(projection.revenue) > 1:
+        growth_rates = np.diff(projection.revenue) / projection.revenue[:-1]
+        revenue_growth = ('normal', float(growth_rates.mean()), max(float(growth_rates.std()), 0.02))
+        margin = float((projection.fcf / projection.revenue).mean())
+    else:
+        revenue_growth = ('normal', 0.08, 0.03)
+        margin = 0.15
+    return {
+        'revenue_growth': revenue_growth,
+        'fcf_margin': ('normal', margin, 0.02),
+        'wacc': ('triangular', wacc - 0.02, wacc, wacc + 0.02),
+        'terminal_growth': ('uniform', growth - 0.01, growth + 0.01),
+    }
+
+class SimulationResult:
+    """Simulated equity values (or values per share) with their summary statistics."""
+
+    def __init__(self, values, invalid):
+        self.values = values
+        self.invalid = invalid   # scenarios with terminal growth >= WACC, left out
+        self.percentiles = dict(zip(PERCENTILES, np.percentile(values, PERCENTILES))) if len(values) else {}
+
+    @property
+    def mean(self):
+        return float(self.values.mean())
+
+    @property
+    def std(self):
+        return float(self.values.std())
+
+    def histogram(self, bins=HISTOGRAM_BINS):
+        """DataFrame of bin ranges, scenario counts and share of scenarios."""
+        counts, edges = np.histogram(self.values, bins=bins)
+        return pd.DataFrame({
+            'From': edges[:-1],
+            'To': edges[1:],
+            'Scenarios': counts,
+            'Share': counts / max(len(self.values), 1),
+        })
+
+    def report_tables(self):
+        """Native Word tables for generate_valuation_report: {{ mc_percentiles }} and {{ mc_histogram }}."""
+        percentiles = pd.DataFrame({
+            'Statistic': [f"P{p}" for p in self.percentiles] + ['Mean', 'Std. deviation', 'Scenarios'],
+            'Value': list(self.percentiles.values()) + [self.mean, self.std, len(self.values)],
+        })
+        histogram = self.histogram(REPORT_HISTOGRAM_BINS)
+        histogram['Share'] = histogram['Share'].map(lambda s: f"{s:.1%}")
+        return {'mc_percentiles': percentiles, 'mc_histogram': histogram}
+
+def simulate_dcf(base_revenue, years, specs, scenarios=100_000, seed=None, net_debt=0.0, shares=None,
+                 mid_year=False, chunk_size=CHUNK_SIZE):
+    """
+    Monte Carlo DCF. Each scenario draws a revenue growth rate per year, an
+    FCF margin, a WACC and a terminal growth rate from `specs` (see
+    simulation_defaults), grows `base_revenue` (the last actual year) over
+    `years`, and values the resulting cash flows with the DCF engine.
+    Scenarios are evaluated as arrays, `chunk_size` at a time.
+    A fixed `seed` reproduces the same values for the same chunk size.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.empty(scenarios)
+    for start in range(0, scenarios, chunk_size):
+        size = min(chunk_size, scenarios - start)
+        growth = sample(rng, specs['revenue_growth'], (size, years))
+        margin = sample(rng, specs['fcf_margin'], (size, 1))
+        wacc = sample(rng, specs['wacc'], size)
+        terminal_growth = sample(rng, specs['terminal_growth'], size)
+
+        fcf = base_revenue * np.cumprod(1.0 + growth, axis=1) * margin
+        enterprise, _ = dcf_enterprise_value(fcf, wacc, terminal_growth, mid_year)
+        values[start:start + size] = equity_value(enterprise, net_debt, shares)
+
+    valid = ~np.isnan(values)
+    return SimulationResult(values[valid], int((~valid).sum()))
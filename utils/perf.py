@@ -0,0 +1,258 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+# One JSON line per run; set PERF_LOG="" to turn the file off
+PERF_LOG = os.environ.get("PERF_LOG", os.path.join("logs", "perf.jsonl"))
+# PERF_PROFILE=1 captures a cProfile dump for every run, not just opted-in ones
+PERF_PROFILE = os.environ.get("PERF_PROFILE", "") not in ("", "0")
+PROFILE_DIR = os.environ.get("PERF_PROFILE_DIR", os.path.join("logs", "profiles"))
+# Only the newest dumps are kept; older .prof files are deleted
+MAX_PROFILES = int(os.environ.get("PERF_MAX_PROFILES", "20"))
+# PERF_PANEL=1 (or ?perf=1 in the URL) shows the sidebar panel. Only with
+# PERF_PANEL=1, or for a logged-in user with this role, can it turn on profiling
+PERF_PANEL = os.environ.get("PERF_PANEL", "") not in ("", "0")
+PERF_ADMIN_ROLE = os.environ.get("PERF_ADMIN_ROLE", "admin")
+RECENT_RUNS = 50
+# Counters summed per stage; any other span field is kept only in the raw spans
+COUNTERS = ("pages", "rows", "bytes")
+
+class PerfRun:
+    """
+    Timing spans recorded while one unit of work (a job, an export) ran,
+    in the order they finished. Spans nest, so stage totals overlap: a
+    'parse' span includes the 'pdf_text' spans taken inside it.
+    """
+
+    def __init__(self, name, owner=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.owner = owner
+        self.started = time.time()
+        self.ms = None
+        self.status = "running"
+        self.spans = []
+        self.profile_path = None
+
+    def stages(self):
+        """Per-stage totals: calls, ms and the summed counters."""
+        totals = {}
+        for span in self.spans:
+            stage = totals.setdefault(span["stage"], {"calls": 0, "ms": 0.0})
+            stage["calls"] += 1
+            stage["ms"] += span["ms"]
+            for counter in COUNTERS:
+                if counter in span:
+                    stage[counter] = stage.get(counter, 0) + span[counter]
+        return totals
+
+    def summary(self):
+        """stages() as a DataFrame, slowest stage first."""
+        frame = pd.DataFrame.from_dict(self.stages(), orient="index")
+        if frame.empty:
+            return frame
+        frame.index.name = "stage"
+        for counter in COUNTERS:
+            if counter in frame:
+                frame[counter] = frame[counter].astype("Int64")
+        return frame.sort_values("ms", ascending=False).round({"ms": 1})
+
+    def to_dict(self):
+        return {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "run": self.id,
+            "name": self.name,
+            "owner": self.owner,
+            "status": self.status,
+            "ms": self.ms,
+            "stages": {name: dict(stage, ms=round(stage["ms"], 1)) for name, stage in self.stages().items()},
+            "profile": self.profile_path,
+        }
+
+# --- Recording ---
+
+_local = threading.local()
+
+def current_run():
+    return getattr(_local, "run", None)
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Times the block as `stage` in the current run. Yields the span's
+    field dict, so the block can fill in counters it only knows at the
+    end (pages, rows, bytes). Outside a run it records nothing.
+    """
+    run = current_run()
+    if run is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        fields["ms"] = (time.perf_counter() - start) * 1000
+        fields["stage"] = stage
+        run.spans.append(fields)
+
+@contextmanager
+def collect():
+    """
+    Records spans into a fresh list instead of the current run, e.g. in a
+    worker process. The list is returned to the caller, who passes it to
+    merge() in the run that submitted the work.
+    """
+    previous = current_run()
+    _local.run = PerfRun("collect")
+    try:
+        yield _local.run.spans
+    finally:
+        _local.run = previous
+
+def merge(spans):
+    """Adds spans recorded by collect() (possibly in another process) to the current run."""
+    run = current_run()
+    if run is not None and spans:
+        run.spans.extend(spans)
+
+# --- Runs ---
+
+_recent = deque(maxlen=RECENT_RUNS)
+_recent_lock = threading.Lock()
+_profile_lock = threading.Lock()
+_logger = None
+_logger_lock = threading.Lock()
+
+def _perf_logger():
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger("perf")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if PERF_LOG:
+                os.makedirs(os.path.dirname(PERF_LOG) or ".", exist_ok=True)
+                handler = logging.FileHandler(PERF_LOG, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+def _dump_profile(profiler, run):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(run.started))
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{run.name}-{run.id}.prof")
+    profiler.dump_stats(path)
+    _rotate_profiles()
+    return path
+
+def _rotate_profiles():
+    # Called with _profile_lock held, so dumps from this process never race
+    entries = [e for e in os.scandir(PROFILE_DIR) if e.name.endswith(".prof") and e.is_file()]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[MAX_PROFILES:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+@contextmanager
+def perf_run(name, owner=None, profile=None):
+    """
+    Collects the spans of one unit of work into a PerfRun, then writes it
+    as a JSON line to PERF_LOG and keeps it for the sidebar panel.
+    With `profile` (default: PERF_PROFILE) the run is also profiled and a
+    .prof file written to PROFILE_DIR (keeping the newest MAX_PROFILES);
+    only the calling thread is profiled, and a run that starts while
+    another is being profiled is timed but not profiled.
+    """
+    run = PerfRun(name, owner)
+    previous = current_run()
+    _local.run = run
+    profiler = None
+    if (PERF_PROFILE if profile is None else profile) and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield run
+        run.status = "ok"
+    except BaseException:
+        run.status = "error"
+        raise
+    finally:
+        run.ms = round((time.perf_counter() - start) * 1000, 1)
+        _local.run = previous
+        if profiler is not None:
+            profiler.disable()
+            try:
+                run.profile_path = _dump_profile(profiler, run)
+            except OSError:
+                pass
+            finally:
+                _profile_lock.release()
+        with _recent_lock:
+            _recent.append(run)
+        try:
+            _perf_logger().info(json.dumps(run.to_dict(), default=str))
+        except OSError:
+            pass
+
+def recent_runs(owner=None, limit=10):
+    """The most recent finished runs (of one owner, if given), newest first."""
+    with _recent_lock:
+        runs = [r for r in reversed(_recent) if owner is None or r.owner == owner]
+    return runs[:limit]
+
+# --- Sidebar panel ---
+
+def perf_panel_enabled():
+    return PERF_PANEL or st.query_params.get("perf") == "1"
+
+def profiling_allowed():
+    """
+    Whether this session may turn on profiling (which writes files on the
+    server): with PERF_PANEL=1, or for a logged-in user with PERF_ADMIN_ROLE.
+    ?perf=1 alone only shows the timings.
+    """
+    if PERF_PANEL:
+        return True
+    roles = st.session_state.get("roles") or []
+    return bool(st.session_state.get("authentication_status")) and PERF_ADMIN_ROLE in roles
+
+def show_perf_panel(owner):
+    """
+    Sidebar expander with the stage timings of the owner's recent runs and,
+    where profiling_allowed(), a switch to profile their next runs. Does
+    nothing unless enabled with PERF_PANEL=1 or ?perf=1.
+    """
+    if not perf_panel_enabled():
+        return
+    with st.sidebar.expander("⏱️ Performance"):
+        if profiling_allowed():
+            st.checkbox("Capture a cProfile dump for my next runs", key="perf_profile")
+        runs = recent_runs(owner)
+        if not runs:
+            st.caption("No runs yet.")
+            return
+        labels = [f"{r.name} · {r.ms:,.0f} ms · {time.strftime('%H:%M:%S', time.localtime(r.started))}" for r in runs]
+        choice = st.selectbox("Run", range(len(runs)), format_func=labels.__getitem__)
+        run = runs[choice]
+        if run.status != "ok":
+            st.caption(f"Run ended with status '{run.status}'.")
+        st.dataframe(run.summary())
+        if run.profile_path:
+            st.caption(f"Profile: `{run.profile_path}`")
+
+def profile_requested():
+    """Whether the current session opted in to profiling from the panel (and still may)."""
+    return bool(st.session_state.get("perf_profile")) and profiling_allowed()
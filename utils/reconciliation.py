@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# A transfer between two of the firm's own accounts posts on each side within this many days
+TRANSFER_WINDOW_DAYS = 3
+# Inflows considered either side of an outflow's date, so long runs of
+# identical amounts (e.g. a fixed monthly payment) cannot blow up the join
+MAX_CANDIDATES = 8
+# Rows equal on all of these are the same transaction
+DUPLICATE_KEY = ['Bank', 'Date', 'Ref', 'Description', 'Amount']
+# Composite sort key: cents * _DAY_SPAN + day number
+_DAY_SPAN = 1_000_000
+
+def flag_duplicates(df):
+    """
+    Boolean Series marking exact repeats of an earlier row. With a Source
+    column (the statement a row came from), identical rows within one
+    statement are kept as genuine (two equal purchases on one day); only
+    the copies a second statement adds again, from an overlapping period,
+    are flagged. A row seen n times in one file and m in another keeps
+    max(n, m) copies.
+    """
+    if df.empty:
+        return pd.Series(False, index=df.index)
+    key = df[DUPLICATE_KEY]
+    if 'Source' in df:
+        occurrence = df.groupby(DUPLICATE_KEY + ['Source'], sort=False, dropna=False).cumcount()
+        key = key.assign(_occurrence=occurrence)
+    return key.duplicated(keep='first')
+
+def _first_occurrence(values):
+    return ~pd.Series(values).duplicated().to_numpy()
+
+def match_transfers(df, window_days=TRANSFER_WINDOW_DAYS, exclude=None):
+    """
+    Pairs each outflow with an inflow of the same absolute amount on a
+    different bank, at most `window_days` apart. Returns an Int64 Series
+    holding a pair number shared by both rows (<NA> for unmatched rows).
+    Each row joins at most one pair; the closest dates are paired first.
+    Rows marked in `exclude` (e.g. duplicates) are left out.
+
+    Inflows are sorted once by (amount in cents, day) and every outflow's
+    candidates are found by binary search on that key, so the cost grows
+    with n log n rather than with every pair of rows.
+    """
+    transfer = pd.Series(pd.NA, index=df.index, dtype='Int64')
+    if df.empty:
+        return transfer
+    amount = df['Amount'].to_numpy(dtype=float)
+    cents = np.rint(np.abs(amount) * 100).astype(np.int64)
+    days = df['Date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    bank = pd.factorize(df['Bank'])[0]
+
+    eligible = cents > 0
+    if exclude is not None:
+        eligible &= ~np.asarray(exclude, dtype=bool)
+    out_rows = np.flatnonzero(eligible & (amount < 0))
+    in_rows = np.flatnonzero(eligible & (amount > 0))
+    if not len(out_rows) or not len(in_rows):
+        return transfer
+
+    in_keys = cents[in_rows] * _DAY_SPAN + days[in_rows]
+    order = np.argsort(in_keys, kind='stable')
+    in_rows, in_keys = in_rows[order], in_keys[order]
+
+    out_keys = cents[out_rows] * _DAY_SPAN + days[out_rows]
+    order = np.argsort(out_keys, kind='stable')
+    out_rows, out_keys = out_rows[order], out_keys[order]
+
+    # Candidate range of each outflow: same cents, day within the window.
+    # The k-th outflow of a (cents, day) key is centred on the k-th inflow
+    # of that key, so equal outflows look at different inflows.
+    lo = np.searchsorted(in_keys, out_keys - window_days, 'left')
+    hi = np.searchsorted(in_keys, out_keys + window_days, 'right')
+    rank = np.arange(len(out_keys)) - np.searchsorted(out_keys, out_keys, 'left')
+    centre = np.minimum(np.searchsorted(in_keys, out_keys, 'left') + rank, np.maximum(hi - 1, lo))
+    lo = np.maximum(lo, centre - MAX_CANDIDATES)
+    hi = np.minimum(hi, centre + MAX_CANDIDATES)
+    counts = np.maximum(hi - lo, 0)
+
+    # Expand the ranges into (outflow row, inflow row) candidate pairs
+    pair_out = np.repeat(out_rows, counts)
+    pair_in = in_rows[np.arange(counts.sum()) + np.repeat(lo - (np.cumsum(counts) - counts), counts)]
+    keep = (cents[pair_out] == cents[pair_in]) & (bank[pair_out] != bank[pair_in])
+    pair_out, pair_in = pair_out[keep], pair_in[keep]
+    gap = np.abs(days[pair_out] - days[pair_in])
+    order = np.lexsort((pair_in, pair_out, gap))
+    pair_out, pair_in = pair_out[order], pair_in[order]
+
+    # Greedy 1:1 assignment, closest first. Pairs that are the best one for
+    # both of their rows are taken at once (usually nearly all of them);
+    # the contested rest are settled by one pass in the same order.
+    take = _first_occurrence(pair_out) & _first_occurrence(pair_in)
+    used = np.zeros(len(df), dtype=bool)
+    used[pair_out[take]] = True
+    used[pair_in[take]] = True
+    matched_out, matched_in = list(pair_out[take]), list(pair_in[take])
+    rest = ~take & ~used[pair_out] & ~used[pair_in]
+    used = bytearray(used)
+    for i, j in zip(pair_out[rest].tolist(), pair_in[rest].tolist()):
+        if not used[i] and not used[j]:
+            used[i] = used[j] = 1
+            matched_out.append(i)
+            matched_in.append(j)
+    if not matched_out:
+        return transfer
+
+    matched_out, matched_in = np.array(matched_out), np.array(matched_in)
+    order = np.argsort(matched_out)
+    ids = np.zeros(len(df), dtype=np.int64)
+    ids[matched_out[order]] = np.arange(1, len(order) + 1)
+    ids[matched_in[order]] = np.arange(1, len(order) + 1)
+    return pd.Series(ids, index=df.index).where(ids > 0).astype('Int64')
+
+def reconcile_transactions(df, window_days=TRANSFER_WINDOW_DAYS):
+    """
+    Adds the reconciliation columns to a consolidated frame (see
+    normalize_transactions): 'Duplicate' flags rows repeated by an
+    overlapping statement, 'Transfer' numbers each matched inter-account
+    transfer pair. Duplicates are never matched as transfers.
+    """
+    df = df.copy()
+    df['Duplicate'] = flag_duplicates(df).to_numpy()
+    df['Transfer'] = match_transfers(df, window_days, exclude=df['Duplicate'].to_numpy())
+    return df
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+# Cache location and size budget can be overridden per deployment
+CACHE_DIR = os.environ.get("STATEMENT_CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.environ.get("STATEMENT_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+def content_key(data, parser_name, parser_version):
+    """Cache key: SHA-256 of the PDF bytes plus the parser name and version."""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{digest}:{parser_name}:v{parser_version}"
+
+class StatementCache:
+    """
+    Persistent SQLite cache of parsed transaction rows, keyed by content_key().
+    Entries are evicted least-recently-used first once the stored rows
+    exceed max_bytes.
+    """
+
+    def __init__(self, path=None, max_bytes=CACHE_MAX_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "statements.sqlite")
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS parsed_statements (
+                    key TEXT PRIMARY KEY,
+                    rows TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON parsed_statements (last_access)")
+
+    def _connect(self):
+        # Worker processes share the file, so wait on locks instead of failing
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key):
+        """Returns the cached rows as a list of tuples, or None on a miss."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT rows FROM parsed_statements WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE parsed_statements SET last_access = ? WHERE key = ?", (time.time(), key))
+        return [tuple(r) for r in json.loads(row[0])]
+
+    def put(self, key, rows):
+        payload = json.dumps([list(r) for r in rows])
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO parsed_statements (key, rows, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM parsed_statements").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM parsed_statements ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM parsed_statements WHERE key = ?", stale)
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM parsed_statements")
+
+    def stats(self):
+        with closing(self._connect()) as conn, conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parsed_statements").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+_cache = None
+
+def get_statement_cache():
+    """Returns the process-wide cache instance, creating it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = StatementCache()
+    return _cache
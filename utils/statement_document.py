@@ -0,0 +1,109 @@
+import io
+
+from utils.perf import span
+
+
+class StatementDocument:
+    """
+    One uploaded statement PDF, opened once and shared by every parser stage.
+    Page text, words and tables are extracted lazily and memoized per page
+    (and per extraction settings), so layout analysis runs once per page.
+    """
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self._pdf = None
+        self._text = {}
+        self._words = {}
+        self._tables = {}
+
+    @classmethod
+    def from_file(cls, file_object):
+        """Builds a document from an uploaded file (or any binary stream)."""
+        file_object.seek(0)
+        data = file_object.read()
+        file_object.seek(0)
+        return cls(getattr(file_object, 'name', 'statement.pdf'), data)
+
+    # --- Lifecycle ---
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            import pdfplumber  # heavy (pdfminer); loaded on first use
+            with span("pdf_open", bytes=len(self.data)):
+                self._pdf = pdfplumber.open(io.BytesIO(self.data))
+        return self._pdf
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Accessors ---
+
+    @property
+    def page_count(self):
+        return len(self.pdf.pages)
+
+    def stream(self):
+        """Returns a fresh named stream over the PDF bytes (for camelot etc.)."""
+        buf = io.BytesIO(self.data)
+        buf.name = self.name
+        return buf
+
+    def page_text(self, index, **kwargs):
+        """Text of a page; extra kwargs are passed to pdfplumber's extract_text."""
+        key = (index, tuple(sorted(kwargs.items())))
+        if key not in self._text:
+            with span("pdf_text", pages=1):
+                self._text[key] = self.pdf.pages[index].extract_text(**kwargs) or ""
+        return self._text[key]
+
+    def iter_page_text(self, **kwargs):
+        for index in range(self.page_count):
+            yield self.page_text(index, **kwargs)
+
+    def stream_page_text(self, **kwargs):
+        """
+        Yields page text one page at a time without memoizing it, releasing
+        each page's layout cache as it goes, so long documents are walked in
+        flat memory. Text that is already memoized is reused.
+        """
+        for index, page in enumerate(self.pdf.pages):
+            key = (index, tuple(sorted(kwargs.items())))
+            if key in self._text:
+                yield self._text[key]
+                continue
+            with span("pdf_text", pages=1):
+                text = page.extract_text(**kwargs) or ""
+                page.close()
+            yield text
+
+    def page_words(self, index, **kwargs):
+        key = (index, tuple(sorted(kwargs.items())))
+        if key not in self._words:
+            with span("pdf_words", pages=1):
+                self._words[key] = self.pdf.pages[index].extract_words(**kwargs)
+        return self._words[key]
+
+    def page_tables(self, index, **kwargs):
+        key = (index, repr(sorted(kwargs.items())))
+        if key not in self._tables:
+            with span("pdf_tables", pages=1):
+                self._tables[key] = self.pdf.pages[index].extract_tables(kwargs or None)
+        return self._tables[key]
+
+
+def as_statement_document(source):
+    """Accepts a StatementDocument or an uploaded file and returns a document."""
+    if isinstance(source, StatementDocument):
+        return source
+    return StatementDocument.from_file(source)
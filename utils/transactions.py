@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Raw columns emitted by the parsers. Dates and amounts stay as the strings
+# found on the statement; normalize_transactions() converts them in bulk.
+RAW_COLUMNS = ['Bank', 'Date', 'DateFormat', 'Ref', 'Description', 'Amount', 'AmountRule']
+OUTPUT_COLUMNS = ['Bank', 'Date', 'Ref', 'Description', 'Amount']
+
+# How a raw amount string becomes a signed float:
+#   signed          keep the sign printed on the statement
+#   signed_nonzero  as 'signed', but zero amounts (e.g. waived fees) are dropped
+#   credit / debit  unsigned amount in a credit (+) or debit (-) section
+#   cr_suffix       negative unless the string carries a 'CR' marker (card statements)
+AMOUNT_RULES = ('signed', 'signed_nonzero', 'credit', 'debit', 'cr_suffix')
+
+class TransactionBatch:
+    """Column-oriented buffer of raw transactions produced by one or more parsers."""
+
+    def __init__(self):
+        self.columns = {c: [] for c in RAW_COLUMNS}
+
+    def add(self, bank, date, date_format, ref, description, amount, amount_rule):
+        cols = self.columns
+        cols['Bank'].append(bank)
+        cols['Date'].append(date)
+        cols['DateFormat'].append(date_format)
+        cols['Ref'].append(ref)
+        cols['Description'].append(description)
+        cols['Amount'].append(amount)
+        cols['AmountRule'].append(amount_rule)
+
+    def extend(self, other):
+        for c in RAW_COLUMNS:
+            self.columns[c].extend(other.columns[c])
+
+    def __len__(self):
+        return len(self.columns['Bank'])
+
+    def rows(self):
+        """Row tuples in RAW_COLUMNS order (used by the on-disk cache)."""
+        return list(zip(*(self.columns[c] for c in RAW_COLUMNS)))
+
+    @classmethod
+    def from_rows(cls, rows):
+        batch = cls()
+        for row in rows:
+            batch.add(*row)
+        return batch
+
+    def to_frame(self):
+        return pd.DataFrame(self.columns, columns=RAW_COLUMNS)
+
+def normalize_transactions(batch):
+    """
+    Converts a raw TransactionBatch into the consolidated frame in one
+    vectorized pass: dates are parsed per format into datetime64, amounts
+    are cleaned and signed by their rule. Rows whose date or amount cannot
+    be parsed are dropped. The result is sorted by date and keeps Date as
+    datetime64; format it only when exporting. Extra columns on a raw
+    frame (e.g. Source) are carried through after the output columns.
+    """
+    raw = batch.to_frame() if isinstance(batch, TransactionBatch) else batch
+    extra_columns = list(raw.columns.difference(RAW_COLUMNS, sort=False))
+    if raw.empty:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS + extra_columns)
+
+    # Dates: one vectorized parse per distinct format
+    dates = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+    for fmt, idx in raw.groupby('DateFormat').groups.items():
+        dates.loc[idx] = pd.to_datetime(raw.loc[idx, 'Date'].astype(str).str.strip(), format=fmt, errors='coerce')
+
+    # Amounts: strip everything but digits (and the sign where it is meaningful)
+    amount_str = raw['Amount'].where(raw['Amount'].notna(), '').astype(str)
+    rule = raw['AmountRule']
+    keeps_sign = rule.isin(['signed', 'signed_nonzero'])
+    cleaned = amount_str.str.replace(r'[^\d.-]', '', regex=True).where(
+        keeps_sign, amount_str.str.replace(r'[^\d.]', '', regex=True)
+    )
+    # Card statements treat a blank amount cell as zero
+    cleaned = cleaned.mask((rule == 'cr_suffix') & (cleaned == ''), '0')
+    values = pd.to_numeric(cleaned, errors='coerce')
+
+    is_debit = (rule == 'debit') | ((rule == 'cr_suffix') & ~amount_str.str.contains('CR', regex=False))
+    amounts = values * np.where(is_debit, -1.0, 1.0)
+
+    df = pd.DataFrame({
+        'Bank': raw['Bank'],
+        'Date': dates,
+        'Ref': raw['Ref'],
+        'Description': raw['Description'],
+        'Amount': amounts,
+    })
+    for column in extra_columns:
+        df[column] = raw[column]
+    drop = df['Date'].isna() | df['Amount'].isna() | ((rule == 'signed_nonzero') & (df['Amount'] == 0))
+    df = df[~drop]
+    return df.sort_values(by='Date', kind='stable').reset_index(drop=True)
@@ -1,9 +1,13 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-from docxtpl import DocxTemplate, InlineImage
+from docx.oxml.ns import qn
 from docx.shared import Inches
+import hashlib
 import io
-import os
+import threading
+from collections import OrderedDict
+from utils.perf import span
+from utils.word_tables import add_dataframe_table, replace_paragraph_with_table
+from utils.workbooks import open_workbook
 
 def clean_currency(x):
     """Helper to clean currency strings from Excel if necessary"""
@@ -13,81 +17,169 @@ def clean_currency(x):
         return x.replace('₹', '').replace(',', '').strip()
     return x
 
+NAV_SHEET = 'NAV Calculation Working'
+# Report templates place the native NAV table with a paragraph holding only {{ nav_table }}
+NAV_TABLE_TAG = 'nav_table'
+
+def load_nav_table(excel_file):
+    """
+    Reads the 'NAV Calculation Working' sheet, dropping empty rows/columns.
+    Accepts an upload or an open ValuationWorkbook; only that sheet is parsed.
+    """
+    with span("load_nav_table") as s:
+        df = open_workbook(excel_file).read_sheet(NAV_SHEET)
+        # Dropping completely empty rows/cols
+        df = df.dropna(how='all').dropna(axis=1, how='all')
+        s["rows"] = len(df)
+    # Fill NaNs with empty strings for better display
+    return df.fillna('')
+
+# Matplotlib table style; part of the image cache key
+NAV_IMAGE_FONT_SIZE = 10
+NAV_IMAGE_SCALE = (1.2, 1.5)
+NAV_IMAGE_DPI = 300
+NAV_IMAGE_CACHE_SIZE = 16
+
+def _draw_nav_table(df, font_size, scale, dpi):
+    # matplotlib is heavy, so it is imported on first use. The Figure is
+    # built directly, not through pyplot: pyplot's "current figure" is
+    # process-global, so concurrent report jobs would save each other's.
+    from matplotlib.figure import Figure
+
+    # Create the plot
+    fig = Figure(figsize=(10, len(df) * 0.5 + 2)) # Dynamic height
+    ax = fig.subplots()
+    ax.axis('off')
+    
+    # Create the table
+    table = ax.table(
+        cellText=df.values, 
+        colLabels=df.columns, 
+        cellLoc='center', 
+        loc='center',
+        colColours=['#f2f2f2']*len(df.columns) # Light gray header
+    )
+    
+    table.auto_set_font_size(False)
+    table.set_fontsize(font_size)
+    table.scale(*scale) # Adjust scaling for readability
+
+    # Save to buffer
+    img_buffer = io.BytesIO()
+    with span("nav_image_save") as s:
+        fig.savefig(img_buffer, format='png', bbox_inches='tight', dpi=dpi)
+        s["bytes"] = img_buffer.tell()
+    return img_buffer.getvalue()
+
+def nav_table_key(df):
+    """Content hash of a cleaned NAV table: labels, shape and every cell value."""
+    digest = hashlib.sha256()
+    digest.update(repr((df.shape, [str(c) for c in df.columns])).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+_nav_images = OrderedDict()
+_nav_images_lock = threading.Lock()
+_nav_image_stats = {"hits": 0, "misses": 0}
+
+def render_nav_table_image(df, font_size=NAV_IMAGE_FONT_SIZE, scale=NAV_IMAGE_SCALE, dpi=NAV_IMAGE_DPI):
+    """
+    Draws the NAV table as a Matplotlib PNG. Only used for templates
+    without a {{ nav_table }} tag; the native Word table is preferred.
+    Images are memoized by table content and style, so regenerating a
+    report after editing only its metadata skips the redraw.
+    """
+    key = (nav_table_key(df), font_size, tuple(scale), dpi)
+    with _nav_images_lock:
+        if key in _nav_images:
+            _nav_images.move_to_end(key)
+            _nav_image_stats["hits"] += 1
+            return io.BytesIO(_nav_images[key])
+        _nav_image_stats["misses"] += 1
+    with span("nav_image_draw", rows=len(df)):
+        data = _draw_nav_table(df, font_size, scale, dpi)
+    with _nav_images_lock:
+        _nav_images[key] = data
+        while len(_nav_images) > NAV_IMAGE_CACHE_SIZE:
+            _nav_images.popitem(last=False)
+    return io.BytesIO(data)
+
+def nav_image_cache_stats():
+    with _nav_images_lock:
+        return dict(_nav_image_stats, entries=len(_nav_images))
+
+def clear_nav_image_cache():
+    with _nav_images_lock:
+        _nav_images.clear()
+        _nav_image_stats.update(hits=0, misses=0)
+
 def generate_nav_table_image(excel_file):
     """
     Reads the 'NAV Calculation Working' sheet from the uploaded Excel
     and generates a Matplotlib image of the table.
     """
     try:
-        # Load the specific sheet
-        df = pd.read_excel(excel_file, sheet_name='NAV Calculation Working')
-        
-        # specific cleanup based on your script's logic
-        # Dropping completely empty rows/cols
-        df = df.dropna(how='all').dropna(axis=1, how='all')
-        
-        # Fill NaNs with empty strings for better display
-        df = df.fillna('')
-
-        # Create the plot
-        fig, ax = plt.subplots(figsize=(10, len(df) * 0.5 + 2)) # Dynamic height
-        ax.axis('off')
-        
-        # Create the table
-        table = ax.table(
-            cellText=df.values, 
-            colLabels=df.columns, 
-            cellLoc='center', 
-            loc='center',
-            colColours=['#f2f2f2']*len(df.columns) # Light gray header
-        )
-        
-        table.auto_set_font_size(False)
-        table.set_fontsize(10)
-        table.scale(1.2, 1.5) # Adjust scaling for readability
-
-        # Save to buffer
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', bbox_inches='tight', dpi=300)
-        img_buffer.seek(0)
-        plt.close(fig)
-        
-        return img_buffer
-
+        return render_nav_table_image(load_nav_table(excel_file))
     except Exception as e:
         raise Exception(f"Error generating NAV table: {str(e)}")
 
-def generate_valuation_report(template_path, context, nav_image_buffer):
+def _table_marker(tag):
+    return f'\u27e6{tag}\u27e7'
+
+def _insert_tables(docx, tables):
+    # Each table tag rendered to a marker paragraph; swap those for the tables
+    markers = {_table_marker(tag): df for tag, df in tables.items()}
+    for p in list(docx.element.body.iter(qn('w:p'))):
+        text = ''.join(t.text or '' for t in p.iter(qn('w:t'))).strip()
+        if text in markers:
+            replace_paragraph_with_table(p, add_dataframe_table(docx, markers[text]))
+
+def generate_valuation_report(template_path, context, nav_image_buffer=None, nav_table=None, tables=None):
     """
-    Renders the docxtpl template with text context and the generated image.
+    Renders the docxtpl template with text context and the NAV table.
+    `nav_table` (see load_nav_table) is written as a native Word table when
+    the template has a {{ nav_table }} paragraph. Otherwise the table goes
+    in as an image: `nav_image_buffer`, or one rendered from `nav_table`.
+    `tables` maps further tags to DataFrames (e.g. the DCF grids) that are
+    written as native tables where the template has them.
     """
-    doc = DocxTemplate(template_path)
+    from docxtpl import DocxTemplate, InlineImage
+    with span("template_load"):
+        doc = DocxTemplate(template_path)
+    # The caller's dict is left alone; the image/table entries are per report
+    context = dict(context)
+    tables = dict(tables or {})
+
+    declared = doc.get_undeclared_template_variables() if (tables or nav_table is not None) else set()
+    if nav_table is not None:
+        if NAV_TABLE_TAG in declared:
+            tables[NAV_TABLE_TAG] = nav_table
+        elif nav_image_buffer is None:
+            nav_image_buffer = render_nav_table_image(nav_table)
+    tables = {tag: df for tag, df in tables.items() if tag in declared}
+    for tag in tables:
+        context[tag] = _table_marker(tag)
     
     # Insert the image into the context object using docxtpl's InlineImage
     if nav_image_buffer:
-        # Note: We use a placeholder key 'nav_image' here. 
-        # Ensure your Word doc uses {{ nav_image }} or we map it correctly.
-        # Based on your file, it uses {{nav.jpg}}
-        
-        # We need to write the buffer to a temp file because InlineImage often prefers paths
-        # or we can try passing the stream directly depending on version.
-        # For safety/stability with docxtpl, saving to a temp file is often most reliable.
-        temp_img_name = "temp_nav_table.png"
-        with open(temp_img_name, "wb") as f:
-            f.write(nav_image_buffer.getbuffer())
-            
-        context['nav.jpg'] = InlineImage(doc, temp_img_name, width=Inches(6.0))
+        # InlineImage reads straight from memory. Each report gets its own
+        # stream, so concurrent sessions never share a file or a position.
+        image = InlineImage(doc, io.BytesIO(nav_image_buffer.getvalue()), width=Inches(6.0))
+        # Jinja reads {{nav.jpg}} as nav['jpg']; {{ nav_image }} is the plain form
+        context['nav'] = {'jpg': image}
+        context['nav_image'] = image
     
     # Render
-    doc.render(context)
+    with span("template_render"):
+        doc.render(context)
+    if tables:
+        with span("native_tables", rows=sum(len(df) for df in tables.values())):
+            _insert_tables(doc.docx, tables)
     
     # Save to memory
     output_io = io.BytesIO()
-    doc.save(output_io)
+    with span("docx_save") as s:
+        doc.save(output_io)
+        s["bytes"] = output_io.tell()
     output_io.seek(0)
-    
-    # Cleanup temp image
-    if os.path.exists("temp_nav_table.png"):
-        os.remove("temp_nav_table.png")
-        
     return output_io
\ No newline at end of file
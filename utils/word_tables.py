@@ -0,0 +1,110 @@
+import numbers
+
+import pandas as pd
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+# Matches the look of the old matplotlib table: light gray header, thin gray rules
+HEADER_FILL = "F2F2F2"
+BORDER_COLOR = "BFBFBF"
+FONT_SIZE = Pt(9)
+
+def format_cell(value):
+    """Text for a table cell: numbers get thousands separators, dates 31-Mar-2024."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, numbers.Integral):
+        return f"{value:,}"
+    if isinstance(value, numbers.Real):
+        return f"{value:,.0f}" if float(value).is_integer() else f"{value:,.2f}"
+    if hasattr(value, 'strftime'):
+        return value.strftime("%d-%b-%Y")
+    return str(value)
+
+def _header_label(column):
+    # pandas names blank header cells "Unnamed: 3"
+    text = str(column)
+    return "" if text.startswith("Unnamed:") else text
+
+def _set_borders(table):
+    tbl_pr = table._tbl.tblPr
+    borders = OxmlElement('w:tblBorders')
+    for edge in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'):
+        el = OxmlElement(f'w:{edge}')
+        el.set(qn('w:val'), 'single')
+        el.set(qn('w:sz'), '4')
+        el.set(qn('w:space'), '0')
+        el.set(qn('w:color'), BORDER_COLOR)
+        borders.append(el)
+    # CT_TblPr is a sequence: tblBorders must come before these, or strict
+    # readers (Word among them) reject the file or drop the borders
+    tbl_pr.remove_all('w:tblBorders')
+    tbl_pr.insert_element_before(borders, 'w:shd', 'w:tblLayout', 'w:tblCellMar', 'w:tblLook',
+                                 'w:tblCaption', 'w:tblDescription', 'w:tblPrChange')
+
+def _shade(cell, fill):
+    shd = OxmlElement('w:shd')
+    shd.set(qn('w:val'), 'clear')
+    shd.set(qn('w:color'), 'auto')
+    shd.set(qn('w:fill'), fill)
+    tc_pr = cell._tc.get_or_add_tcPr()
+    tc_pr.remove_all('w:shd')
+    tc_pr.insert_element_before(shd, 'w:noWrap', 'w:tcMar', 'w:textDirection', 'w:tcFitText',
+                                'w:vAlign', 'w:hideMark', 'w:headers', 'w:cellIns', 'w:cellDel',
+                                'w:cellMerge', 'w:tcPrChange')
+
+def _write(cell, text, bold=False, align=None):
+    paragraph = cell.paragraphs[0]
+    paragraph.paragraph_format.space_before = Pt(0)
+    paragraph.paragraph_format.space_after = Pt(0)
+    if align is not None:
+        paragraph.alignment = align
+    run = paragraph.add_run(text)
+    run.font.size = FONT_SIZE
+    run.bold = bold
+
+def add_dataframe_table(doc, df):
+    """
+    Appends a DataFrame to a python-docx Document as a native Word table:
+    header row shaded and repeated on every page, numeric columns right
+    aligned. Formatting is applied directly, so the template does not need
+    any particular table style. A frame read with header=None (integer
+    column labels) has its first row used as the header.
+    Returns the python-docx Table.
+    """
+    if len(df) and all(isinstance(c, numbers.Integral) for c in df.columns):
+        df = pd.DataFrame(df.values[1:], columns=list(df.iloc[0]))
+    table = doc.add_table(rows=len(df) + 1, cols=len(df.columns))
+    table.alignment = WD_TABLE_ALIGNMENT.CENTER
+    _set_borders(table)
+
+    # Positional, since blank header cells can repeat a column label
+    columns = [df.iloc[:, i] for i in range(len(df.columns))]
+    numeric = [pd.api.types.is_numeric_dtype(col) or
+               all(isinstance(v, numbers.Number) for v in col if not isinstance(v, str) or v)
+               for col in columns]
+
+    header = table.rows[0]
+    # Repeat the header row when the table breaks across pages
+    tbl_header = OxmlElement('w:tblHeader')
+    header._tr.get_or_add_trPr().append(tbl_header)
+    for cell, column, is_numeric in zip(header.cells, df.columns, numeric):
+        _shade(cell, HEADER_FILL)
+        _write(cell, _header_label(column), bold=True,
+               align=WD_ALIGN_PARAGRAPH.RIGHT if is_numeric else WD_ALIGN_PARAGRAPH.CENTER)
+
+    # Cells are addressed through the row objects once; table.cell(r, c) re-walks the grid
+    for row, values in zip(table.rows[1:], df.itertuples(index=False, name=None)):
+        for cell, value, is_numeric in zip(row.cells, values, numeric):
+            _write(cell, format_cell(value), align=WD_ALIGN_PARAGRAPH.RIGHT if is_numeric else None)
+    return table
+
+def replace_paragraph_with_table(paragraph_element, table):
+    """Moves `table` to where `paragraph_element` (a <w:p>) is and removes the paragraph."""
+    paragraph_element.addnext(table._tbl)
+    paragraph_element.getparent().remove(paragraph_element)
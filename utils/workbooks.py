@@ -0,0 +1,90 @@
+import hashlib
+import io
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.perf import span
+
+WORKBOOK_CACHE_SIZE = 4
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+def _xlsx_sheet_names(data):
+    # Sheet names live in xl/workbook.xml; no cell, style or string data is parsed
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = ET.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in root.iter(f'{SPREADSHEET_NS}sheet')]
+
+class ValuationWorkbook:
+    """
+    An uploaded Excel workbook, read lazily. The sheet index is built from
+    the workbook manifest without loading any sheet, and each sheet is only
+    parsed the first time it is asked for (read-only), then kept.
+    """
+
+    def __init__(self, data, sha256=None):
+        self.data = data
+        self.sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        self._sheet_names = None
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sheet_names(self):
+        if self._sheet_names is None:
+            try:
+                self._sheet_names = _xlsx_sheet_names(self.data)
+            except (zipfile.BadZipFile, KeyError, ET.ParseError):
+                # Legacy .xls (or an odd xlsx): let pandas work it out
+                self._sheet_names = pd.ExcelFile(io.BytesIO(self.data)).sheet_names
+        return self._sheet_names
+
+    def read_sheet(self, name, header=0):
+        """DataFrame of one sheet; a copy, so callers may modify it freely."""
+        if name not in self.sheet_names:
+            raise ValueError(f"Worksheet named '{name}' not found")
+        key = (name, header)
+        with self._lock:
+            df = self._frames.get(key)
+            if df is None:
+                with span("excel_read", bytes=len(self.data)) as s:
+                    df = pd.read_excel(io.BytesIO(self.data), sheet_name=name, header=header)
+                    s["rows"] = len(df)
+                self._frames[key] = df
+        return df.copy()
+
+# --- Workbook cache ---
+
+_workbooks = OrderedDict()
+_workbooks_lock = threading.Lock()
+
+def open_workbook(source):
+    """
+    Returns the ValuationWorkbook for an upload (file object, bytes or path).
+    Workbooks are memoized by the SHA-256 of their bytes, so the preview,
+    the report and any rerun with the same upload share the parsed sheets.
+    """
+    if isinstance(source, ValuationWorkbook):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            data = f.read()
+    else:
+        source.seek(0)
+        data = source.read()
+        source.seek(0)
+
+    key = hashlib.sha256(data).hexdigest()
+    with _workbooks_lock:
+        if key in _workbooks:
+            _workbooks.move_to_end(key)
+            return _workbooks[key]
+        workbook = _workbooks[key] = ValuationWorkbook(data, key)
+        while len(_workbooks) > WORKBOOK_CACHE_SIZE:
+            _workbooks.popitem(last=False)
+    return workbook